@@ -1,45 +1,72 @@
+''' Ser-Hilary's sizing nodes for ComfyUI.
+
+    Importing the package doesn't load the node modules; NODE_CLASS_MAPPINGS imports a node's module the first
+    time the node is looked up. ComfyUI goes through every entry straight after importing the package, so inside
+    ComfyUI all of them still load at startup. What's saved is for everything else: the command line tools
+    (python -m SDXL_sizing, image_scan, ...) and library code that imports one module, which don't pay for the
+    nodes and modules they don't use. Nothing here installs packages or runs subprocesses. Set
+    SDXL_SIZING_BANNER=0 to hide the "Loaded" message. benchmarks/bench_import.py measures the import time.
+'''
+import importlib
 import os
-import subprocess
-import importlib.util
 import sys
+from collections.abc import Mapping
 
-import __main__
+# node name -> (module, class, display name)
+NODES = {
+    "sizing_node": ("conditioning_sizing_for_SDXL", "sizing_node", "sizing for SDXL (advanced)"),
+    "sizing_node_basic": ("conditioning_sizing_for_SDXL", "sizing_node_basic", "sizing for SDXL"),
+    "sizing_node_unparsed": ("conditioning_sizing_for_SDXL", "sizing_node_unparsed", "sizing for SDXL (int/float inputs)"),
+    "sizing_node_report": ("conditioning_sizing_for_SDXL", "sizing_node_report", "sizing for SDXL (with report)"),
+    "sizing_cost_node": ("conditioning_sizing_for_SDXL", "sizing_cost_node", "sizing cost estimate"),
+    "sizing_sweep_node": ("sweep", "sizing_sweep_node", "sizing for SDXL (sweep)"),
+    "final_size_node": ("inverse_sizing", "final_size_node", "sizing for SDXL (from final size)"),
+    "hires_plan_node": ("inverse_sizing", "hires_plan_node", "sizing for SDXL (hires fix plan)"),
+    "get_aspect_from_ints": ("conditioning_sizing_for_SDXL", "get_aspect_from_ints", "width, height -> \'WIDTHxHEIGHT\'"),
+    "get_aspect_from_image": ("conditioning_sizing_for_SDXL", "get_aspect_from_image", "IMAGE -> \'WIDTHxHEIGHT\'"),
+    "get_aspect_from_latent": ("conditioning_sizing_for_SDXL", "get_aspect_from_latent", "LATENT -> \'WIDTHxHEIGHT\'"),
+    "get_aspect_from_mask": ("conditioning_sizing_for_SDXL", "get_aspect_from_mask", "MASK -> \'WIDTHxHEIGHT\'"),
+}
 
-python = sys.executable
 
-def is_installed(package, package_overwrite=None):
-    try:
-        spec = importlib.util.find_spec(package)
-    except ModuleNotFoundError:
-        pass
+def _load(module, name):
+    return getattr(importlib.import_module(f".{module}", __name__), name)
 
-    package = package_overwrite or package
 
-    if spec is None:
-        print(f"Installing {package}...")
-        command = f'"{python}" -m pip install {package}'
-  
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, env=os.environ)
+class LazyNodeMapping(Mapping):
+    ''' NODE_CLASS_MAPPINGS, but each node class is only imported when it's first looked up. Iterating the keys
+        or display names doesn't import anything, while items() and values() import every node.
+    '''
+    def __init__(self, nodes):
+        self._nodes = nodes
+        self._loaded = {}
 
-        if result.returncode != 0:
-            print(f"Couldn't install\nCommand: {command}\nError code: {result.returncode}")
+    def __getitem__(self, key):
+        cls = self._loaded.get(key)
+        if cls is None:
+            module, name, _ = self._nodes[key]
+            cls = self._loaded[key] = _load(module, name)
+        return cls
 
-from .conditioning_sizing_for_SDXL import sizing_node, sizing_node_basic, sizing_node_unparsed, get_aspect_from_ints, get_aspect_from_image
+    def __iter__(self):
+        return iter(self._nodes)
 
-NODE_CLASS_MAPPINGS = {
-    "sizing_node": sizing_node,
-    "sizing_node_basic": sizing_node_basic,
-    "sizing_node_unparsed": sizing_node_unparsed,
-    "get_aspect_from_ints": get_aspect_from_ints,
-    "get_aspect_from_image": get_aspect_from_image
+    def __len__(self):
+        return len(self._nodes)
+
+
+NODE_CLASS_MAPPINGS = LazyNodeMapping(NODES)
+NODE_DISPLAY_NAME_MAPPINGS = {key: display for key, (_, _, display) in NODES.items()}
+
+
+def __getattr__(name):
+    # keeps "from <package> import sizing_node" working without importing everything up front
+    for module, cls, _ in NODES.values():
+        if cls == name:
+            return _load(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-}
-NODE_DISPLAY_NAME_MAPPINGS = {
-    "sizing_node": "sizing for SDXL (advanced)",
-    "sizing_node_basic": "sizing for SDXL",
-    "sizing_node_unparsed": "sizing for SDXL (int/float inputs)",
-    "get_aspect_from_ints": "width, height -> \'WIDTHxHEIGHT\'",
-    "get_aspect_from_image": "IMAGE -> \'WIDTHxHEIGHT\'"
-}
 
-print('\033[34mSer-Hilary Custom Nodes: \033[92mLoaded\033[0m')
+if os.environ.get("SDXL_SIZING_BANNER", "1") != "0":
+    # stderr, so it doesn't end up in the output of the command line tools
+    print('\033[34mSer-Hilary Custom Nodes: \033[92mLoaded\033[0m', file = sys.stderr)
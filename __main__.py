@@ -0,0 +1,113 @@
+''' Sizes a stream of requests from the command line, for precomputing the conditioning for whole prompt catalogs
+    outside ComfyUI. From the folder that holds this one (e.g. ComfyUI/custom_nodes):
+
+        python -m SDXL_sizing requests.jsonl -o sizes.jsonl
+        cat requests.jsonl | python -m SDXL_sizing --workers 8 > sizes.jsonl
+
+    Each input line is a JSON object with any of the advanced node's inputs: native_res, aspect, original_res,
+    crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args and seed. Anything left out
+    comes from the command line options. Values can be the node's strings ("16:9", "1920x1080") or plain numbers,
+    and original_res can also be a [width, height] pair. A line without a seed gets --seed plus its line number,
+    so --randomaspect lines get different aspects, and the same ones on every run.
+
+    Each output line has the seven node outputs, plus the request's "id" if it had one (--echo copies the whole
+    request). A line that can't be sized gets {"line": n, "error": "..."} instead, and the rest carry on. Lines
+    are sized in chunks over a pool of worker processes, but the output is always in input order.
+'''
+import argparse
+import json
+import sys
+from functools import partial
+
+from .conditioning_sizing_for_SDXL import REQUEST_DEFAULTS, REQUEST_FIELDS, SIZE_FIELDS, as_node_string, bucketing_options, sizing_node
+from .parallel import imap_ordered
+
+
+_node = sizing_node()
+
+
+def size_request(request, defaults):
+    ''' The node outputs for one request dict, filled in from defaults, as a dict of SIZE_FIELDS. '''
+    unknown = set(request) - set(REQUEST_FIELDS) - {"id"}
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    inputs = dict(defaults)
+    inputs.update((k, v) for k, v in request.items() if k != "id")
+    for name in ("native_res", "aspect", "original_res"):
+        inputs[name] = as_node_string(inputs[name])
+    return dict(zip(SIZE_FIELDS, _node.get_sizes(**inputs)))
+
+
+def size_line(defaults, echo, numbered_line):
+    ''' One JSONL input line -> (ok, one JSONL output line without the newline). Runs in the worker processes,
+        so problems come back as error records rather than exceptions.
+    '''
+    number, line = numbered_line
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("expected a JSON object")
+        record = dict(request) if echo else ({"id": request["id"]} if "id" in request else {})
+        record.update(size_request(request, dict(defaults, seed = defaults.get("seed", 0) + number)))
+    except Exception as e:
+        return False, json.dumps({"line": number, "error": f"{type(e).__name__}: {e}"})
+    return True, json.dumps(record)
+
+
+def _numbered_lines(f):
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            yield number, line
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m SDXL_sizing", description = "Size JSONL sizing requests with the sizing node's math.")
+    parser.add_argument("input", nargs = "?", default = "-", help = "JSONL file of requests (default: stdin)")
+    parser.add_argument("-o", "--output", default = "-", help = "output file (default: stdout)")
+    parser.add_argument("--native-res", default = REQUEST_DEFAULTS["native_res"])
+    parser.add_argument("--aspect", default = REQUEST_DEFAULTS["aspect"], help = "used when a request has no aspect")
+    parser.add_argument("--original-res", default = REQUEST_DEFAULTS["original_res"], help = "used when a request has no original_res")
+    parser.add_argument("--crop-extra", type = float, default = REQUEST_DEFAULTS["crop_extra"])
+    parser.add_argument("--downscale-effect", type = float, default = REQUEST_DEFAULTS["downscale_effect"])
+    parser.add_argument("--fit-aspect-to-bucket", action = "store_true")
+    parser.add_argument("--strict-bucketing", default = REQUEST_DEFAULTS["strict_bucketing"], choices = bucketing_options())
+    parser.add_argument("--extra-args", default = REQUEST_DEFAULTS["extra_args"])
+    parser.add_argument("--seed", type = int, default = REQUEST_DEFAULTS["seed"], help = "a line without a seed gets this plus its line number (default 0)")
+    parser.add_argument("--echo", action = "store_true", help = "copy each request's fields into its output line")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes (default: one per CPU, 0 for none)")
+    parser.add_argument("--chunksize", type = int, default = 1024, help = "lines per chunk sent to a worker (default 1024)")
+    args = parser.parse_args(argv)
+
+    defaults = {
+        "native_res": args.native_res,
+        "aspect": args.aspect,
+        "original_res": args.original_res,
+        "crop_extra": args.crop_extra,
+        "downscale_effect": args.downscale_effect,
+        "fit_aspect_to_bucket": "enabled" if args.fit_aspect_to_bucket else "disabled",
+        "strict_bucketing": args.strict_bucketing,
+        "extra_args": args.extra_args,
+        "seed": args.seed,
+    }
+    work = partial(size_line, defaults, args.echo)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding = "utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding = "utf-8")
+    count = errors = 0
+    try:
+        for ok, out in imap_ordered(work, _numbered_lines(source), workers = args.workers, chunksize = args.chunksize):
+            sink.write(out + "\n")
+            count += 1
+            errors += not ok
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    print(f"sized {count - errors} requests, {errors} errors", file = sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+''' Batch versions of the sizing node math, for when you've got a lot of prompts to size at once and don't want to
+    go through sizing_node.get_sizes one call at a time. Everything here works on whole NumPy arrays, but it follows
+    the scalar code step by step (same rounding, same order of operations) so the results come out identical.
+
+    This needs numpy, which ComfyUI already depends on. The node file itself doesn't import this module, so a
+    single-file install of conditioning_sizing_for_SDXL.py still works without it.
+'''
+from functools import lru_cache
+
+import numpy as np
+
+from .conditioning_sizing_for_SDXL import BUCKET_MODE_NAMES, bucket_table_for, get_bucket_table, sizing_node
+
+
+SIZES_DTYPE = np.dtype([
+    ("width", np.int64),
+    ("height", np.int64),
+    ("crop_w", np.int64),
+    ("crop_h", np.int64),
+    ("target_width", np.int64),
+    ("target_height", np.int64),
+    ("downscale", np.float64),
+])
+
+# the array dtype for each kind of parsed input (see input_kind), when sizing a group of requests together
+KIND_DTYPES = {"pair": np.int64, "int": np.int64, "float": np.float64}
+
+_node = sizing_node()
+
+
+def input_kind(value):
+    ''' "pair", "int" or "float" for a parsed aspect or original_res. get_sizes_batch reads the kind of array it's
+        given as the kind of input, so only values of the same kind can be sized in one call.
+    '''
+    if isinstance(value, tuple):
+        return "pair"
+    return "float" if isinstance(value, float) else "int"
+
+
+@lru_cache(maxsize=None)
+def _bucket_arrays(index, area = None):
+    ''' The sorted ratio keys of a compiled BucketIndex, plus the matching widths and heights, as arrays.
+        Where a ratio has more than one bucket, area picks between them the same way BucketIndex.lookup does.
+    '''
+    keys = np.array(index.ratios, dtype=np.float64)
+    dims = np.array([index.lookup(r, area) for r in index.ratios], dtype=np.int64)
+    return keys, dims[:, 0], dims[:, 1]
+
+
+def make_64(num):
+    ''' Array version of sizing_node.make_64. '''
+    num = np.trunc(num).astype(np.int64)
+    return np.where(num % 64 < 32, num // 64 * 64, (num + 1) // 64 * 64)
+
+
+def recommended_res(aspect, mode = "Report", area = None):
+    ''' Array version of sizing_node.getRecommendedRes. Returns (target_width, target_height). '''
+    return _lookup(get_bucket_table(mode), aspect, area)
+
+
+def _lookup(index, aspect, area = None):
+    keys, widths, heights = _bucket_arrays(index, area)
+
+    # index of the first key that's > aspect, which is where the scalar loop stops
+    hi = np.searchsorted(keys, aspect, side="right")
+    past_end = hi == len(keys)
+    hi = np.minimum(hi, len(keys) - 1)
+    lo = np.maximum(hi - 1, 0)
+
+    # the scalar loop compares against 0 when there's nothing below
+    lo_key = np.where(hi == 0, 0.0, keys[lo])
+    pick = np.where(np.abs(keys[hi] - aspect) < np.abs(lo_key - aspect), hi, lo)
+    pick = np.where(past_end, len(keys) - 1, pick)
+    return widths[pick], heights[pick]
+
+
+def _as_native_res(native_res):
+    if isinstance(native_res, str):
+        native_res = _node.parse_res(native_res)
+    if isinstance(native_res, tuple):
+        native_res = int((native_res[0] * native_res[1])**(1/2))
+    elif isinstance(native_res, float):
+        native_res = int(native_res * 1024)
+    return native_res
+
+
+def _check_inputs(aspect, original_res):
+    # the inputs the scalar code raises on (mostly ZeroDivisionError) would come out of the array math as garbage
+    # sizes instead, so they're refused up front
+    bad = np.zeros(len(aspect), dtype=bool)
+    if aspect.ndim == 2:
+        bad |= (aspect <= 0).any(axis=1)
+    elif np.issubdtype(aspect.dtype, np.floating):
+        bad |= ~np.isfinite(aspect)
+    if original_res.ndim == 2:
+        bad |= (original_res <= 0).any(axis=1)
+    else:
+        bad |= np.broadcast_to(~np.isfinite(original_res) | (original_res <= 0), bad.shape)
+    if bad.any():
+        i = int(np.argmax(bad))
+        raise ValueError(f"get_sizes_batch: invalid input at row {i} (aspect {aspect[i].tolist()}, original_res {np.broadcast_to(original_res, (len(aspect),) + original_res.shape[1:])[i].tolist()}); "
+                         "aspect pairs and original_res must be positive and finite")
+
+
+def get_sizes_batch(aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, native_res = 1024, strict_bucketing = "SDXL Report", fit_aspect_to_bucket = "disabled", extra_args = ""):
+    ''' Vectorized sizing_node.get_sizes. Returns a structured array with one row per input, with the fields
+        width, height, crop_w, crop_h, target_width, target_height and downscale.
+
+        The string inputs of the node are replaced by arrays, and the kind of array stands in for the kind of
+        string the node would have parsed:
+        "aspect"
+            - float array of shape (n,) - like "0.5". Anything <= 0 becomes 1.0.
+            - int array of shape (n,) - like "2". -1 takes the aspect from original_res if that's (w, h).
+            - int array of shape (n, 2) - like "1:2".
+        "original_res"
+            - int array of shape (n,) - like "600", the long side (or short side with --shortside, etc).
+            - float array of shape (n,) - like "2.0", a multiple of the generation size.
+            - int array of shape (n, 2) - like "600x600".
+        crop_extra and downscale_effect can be scalars or arrays of shape (n,). native_res, strict_bucketing,
+        fit_aspect_to_bucket and extra_args are shared by the whole batch and take the same values as the node.
+        --randomaspect isn't supported here.
+
+        Raises ValueError if an aspect pair or original_res isn't positive, or a float aspect or original_res isn't
+        finite, where the node would raise (or give a negative size), rather than returning garbage for that row.
+    '''
+    options = _node.parse_extra_args(extra_args)
+    if options.randomaspect is not None:
+        raise ValueError("get_sizes_batch: --randomaspect is not supported for batch sizing")
+    sharp, nudge, nocrop, side = options.sharp, options.nudge, options.nocrop, options.side
+
+    bucketMode = BUCKET_MODE_NAMES.get(strict_bucketing, strict_bucketing)
+    native_res = _as_native_res(native_res)
+
+    aspect = np.asarray(aspect)
+    original_res = np.asarray(original_res)
+    original_pairs = original_res.ndim == 2
+    _check_inputs(aspect, original_res)
+
+    # parse the aspect input -> float
+    if aspect.ndim == 2:
+        aspect = aspect[:, 0] / aspect[:, 1]
+    elif np.issubdtype(aspect.dtype, np.integer):
+        if original_pairs:
+            from_original = original_res[:, 0] / original_res[:, 1]
+        else:
+            from_original = 1.0
+        aspect = np.where(aspect == -1, from_original, np.where(aspect <= 0, 1.0, aspect))
+    else:
+        aspect = np.where(aspect <= 0, 1.0, aspect)
+    aspect = aspect.astype(np.float64)
+    n = len(aspect)
+
+    crop_extra = np.broadcast_to(np.asarray(crop_extra, dtype=np.float64), (n,))
+    downscale_effect = np.broadcast_to(np.asarray(downscale_effect, dtype=np.float64), (n,))
+
+    # match the buckets
+    c = np.power(native_res**2 / aspect, 1/2)
+    target_width = make_64(c * aspect)
+    target_height = make_64(c)
+
+    table = bucket_table_for(bucketMode, native_res) if bucketMode else None
+    if table is not None:
+        bucket = (aspect <= 4.0) & (aspect >= 0.25)
+        if bucket.any():
+            bw, bh = _lookup(table, aspect[bucket], area = native_res**2)
+            target_width[bucket] = bw
+            target_height[bucket] = bh
+
+    if fit_aspect_to_bucket == "enabled":
+        aspect = target_width / target_height
+
+    # parse the original resolution input -> width, height
+    if original_pairs:
+        width = original_res[:, 0].astype(np.int64)
+        height = original_res[:, 1].astype(np.int64)
+    elif np.issubdtype(original_res.dtype, np.floating):
+        width = np.trunc(original_res * target_width).astype(np.int64)
+        height = np.trunc(original_res * target_height).astype(np.int64)
+    else:
+        original_res = np.broadcast_to(original_res.astype(np.int64), (n,))
+        landscape = target_width > target_height
+        if side == 1:
+            width = np.where(landscape, np.trunc(original_res * aspect), original_res).astype(np.int64)
+            height = np.where(landscape, original_res, np.trunc(original_res / aspect)).astype(np.int64)
+        elif side == 2:
+            h = np.power(original_res**2 / aspect, 1/2)
+            width = np.trunc(h * aspect).astype(np.int64)
+            height = np.trunc(h).astype(np.int64)
+        else:
+            width = np.where(landscape, original_res, np.trunc(original_res * aspect)).astype(np.int64)
+            height = np.where(landscape, np.trunc(original_res / aspect), original_res).astype(np.int64)
+
+    if nudge[1] != 0.0:
+        if nudge[0] == "w":
+            width = np.rint((height / target_height) * (target_width + nudge[1]*32)).astype(np.int64)
+        else:
+            height = np.rint((width / target_width) * (target_height + nudge[1]*32)).astype(np.int64)
+
+    # calculate cropping
+    if nocrop:
+        crop_w = np.zeros(n, dtype=np.int64)
+        crop_h = np.zeros(n, dtype=np.int64)
+        downscale = np.minimum(width / target_width, height / target_height)
+    else:
+        ratio = width / height
+        target_ratio = target_width / target_height
+        wider = ratio > target_ratio
+        taller = ratio < target_ratio
+
+        extra_w = np.trunc(target_width * crop_extra).astype(np.int64)
+        extra_h = np.trunc(target_height * crop_extra).astype(np.int64)
+        crop_w = extra_w // 2
+        crop_h = extra_h // 2
+        downscale = (1 - crop_extra) * width / target_width
+
+        # both crop branches get computed for every row, so ignore the divisions the scalar code would skip
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x1_w = np.trunc(width * target_height / height).astype(np.int64) - target_width
+            x1_h = np.trunc(height * target_width / width).astype(np.int64) - target_height
+        crop_w = np.where(wider, np.trunc(x1_w + target_width * crop_extra).astype(np.int64) // 2, crop_w)
+        crop_h = np.where(taller, np.trunc(x1_h + target_height * crop_extra).astype(np.int64) // 2, crop_h)
+        downscale = np.where(wider, (1 - crop_extra) * height / target_height, downscale)
+
+    if sharp:
+        width = np.trunc(width * sharp).astype(np.int64)
+        height = np.trunc(height * sharp).astype(np.int64)
+
+    downscale = np.minimum(1 - ((1 - downscale) * downscale_effect), 1.0)
+
+    out = np.empty(n, dtype=SIZES_DTYPE)
+    out["width"] = width
+    out["height"] = height
+    out["crop_w"] = crop_w
+    out["crop_h"] = crop_h
+    out["target_width"] = target_width
+    out["target_height"] = target_height
+    out["downscale"] = downscale
+    return out
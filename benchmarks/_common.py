@@ -0,0 +1,20 @@
+''' Shared bits for the benchmark scripts. The repo is a ComfyUI custom node folder rather than an installed
+    package, so this imports it by folder name, the same way ComfyUI does.
+'''
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_package():
+    parent = os.path.dirname(ROOT)
+    if parent not in sys.path:
+        sys.path.insert(0, parent)
+    return importlib.import_module(os.path.basename(ROOT))
+
+
+def import_module(name):
+    package = import_package()
+    return importlib.import_module(f"{package.__name__}.{name}")
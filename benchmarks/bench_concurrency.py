@@ -0,0 +1,108 @@
+''' Drives the sizing node from several threads and several processes at once, and checks that every result matches
+    a single-threaded run of the same inputs.
+
+    python benchmarks/bench_concurrency.py                      # 1, 2, 4 and 8 workers, threads and processes
+    python benchmarks/bench_concurrency.py --workers 1 4 16 --requests 100000
+    python benchmarks/bench_concurrency.py --cache              # share the result cache between the threads
+
+    For each worker count it prints the wall time, calls/sec, the speedup over the single-threaded reference run
+    and the scaling efficiency (speedup / workers). On a GIL build threads can't speed up pure Python, so expect
+    the thread efficiency to fall off as 1 / workers there; the equality check is the part that matters. Processes
+    show what the machine can do, up to its core count. Exits 1 if any result differs from the single-threaded run.
+
+    The inputs cover every bucketing mode, the aspect and original_res formats and the extra_args flags, including
+    --randomaspect with a seed. The result cache is off unless you pass --cache, so every call does the work.
+'''
+import argparse
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from _common import import_module
+
+sizing = import_module("conditioning_sizing_for_SDXL")
+
+_node = sizing.sizing_node()
+
+
+def build_requests(count, seed = 0):
+    ''' count argument tuples for sizing_node.get_sizes, the same ones every run. '''
+    rng = random.Random(seed)
+    aspects = ("1:1", "16:9", "9:16", "4:3", "2:3", "21:9", "0.7", "1.5", "-1", "3 by 2")
+    originals = ("1920x1080", "1080x1920", "1200", "800", "2.0", "1.0", "640x480", "4000x3000")
+    extra_args = ("", "--nocrop", "--sharp", "--supersharp", "--shortside", "--equivalent", "--nudge w 0.8", "--randomaspect 2x3 4x2")
+    modes = sizing.bucketing_options()
+    return [
+        (rng.choice(("1024", "768", "1.0")), rng.choice(aspects), rng.choice(originals), rng.choice((0.0, 0.05, 0.1)), rng.choice((0.0, 0.5, 1.0)),
+         "disabled", rng.choice(("disabled", "enabled")), rng.choice(modes), rng.choice(extra_args), rng.randrange(1 << 32))
+        for _ in range(count)
+    ]
+
+
+def run_shard(requests):
+    return [_node.get_sizes(*request) for request in requests]
+
+
+def _configure(cache):
+    if not cache:
+        sizing.sizes_cache.configure(maxsize = 0)
+
+
+def _shards(requests, workers):
+    size = -(-len(requests) // workers)
+    return [requests[i:i + size] for i in range(0, len(requests), size)]
+
+
+def run(pool, requests, workers):
+    ''' (seconds, results in request order) for requests split evenly over the pool's workers. '''
+    start = time.perf_counter()
+    results = [result for shard in pool.map(run_shard, _shards(requests, workers)) for result in shard]
+    return time.perf_counter() - start, results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the sizing node from several threads and processes.")
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4, 8], help = "worker counts to try (default 1 2 4 8)")
+    parser.add_argument("--requests", type = int, default = 40000, help = "calls per run (default 40000)")
+    parser.add_argument("--kind", choices = ("threads", "processes", "both"), default = "both")
+    parser.add_argument("--cache", action = "store_true", help = "leave the shared result cache on")
+    args = parser.parse_args(argv)
+
+    _configure(args.cache)
+    requests = build_requests(args.requests)
+    start = time.perf_counter()
+    expected = run_shard(requests)
+    single = time.perf_counter() - start
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"python {sys.version.split()[0]}, GIL {'on' if gil else 'off'}, {args.requests} calls, cache {'on' if args.cache else 'off'}")
+    print(f"single-threaded reference: {single:.3f} s, {args.requests / single:.0f} calls/s\n")
+    print(f"{'kind':<10} {'workers':>7} {'seconds':>9} {'calls/s':>10} {'speedup':>8} {'efficiency':>11}  results")
+
+    kinds = ("threads", "processes") if args.kind == "both" else (args.kind,)
+    failed = False
+    for kind in kinds:
+        for workers in args.workers:
+            if kind == "threads":
+                pool = ThreadPoolExecutor(workers)
+            else:
+                pool = ProcessPoolExecutor(workers, initializer = _configure, initargs = (args.cache,))
+            with pool:
+                # start the workers before the clock does
+                list(pool.map(run_shard, [requests[:1]] * workers))
+                seconds, results = run(pool, requests, workers)
+            speedup = single / seconds
+            mismatches = sum(result != reference for result, reference in zip(results, expected)) + abs(len(results) - len(expected))
+            failed = failed or mismatches > 0
+            status = "equal" if not mismatches else f"{mismatches} DIFFER"
+            print(f"{kind:<10} {workers:>7} {seconds:>9.3f} {args.requests / seconds:>10.0f} {speedup:>8.2f} {speedup / workers:>11.0%}  {status}")
+
+    if failed:
+        print("\nFAILED: some results differ from the single-threaded run")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
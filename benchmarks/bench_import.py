@@ -0,0 +1,74 @@
+''' Measures how long it takes to import the package in a fresh interpreter, which is what every ComfyUI worker
+    pays at startup. Each run is a new process, so nothing is already cached in sys.modules.
+
+    python benchmarks/bench_import.py [--runs N] [--budget-ms MS] [--nodes]
+
+    --nodes also resolves every entry in NODE_CLASS_MAPPINGS (what ComfyUI does right after importing). With
+    --budget-ms the script exits 1 if the median import time is over budget. The slowest modules come from
+    python -X importtime.
+'''
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from _common import ROOT
+
+PARENT = os.path.dirname(ROOT)
+PACKAGE = os.path.basename(ROOT)
+
+
+def _script(resolve_nodes):
+    script = f"import time; t = time.perf_counter(); import {PACKAGE} as p"
+    if resolve_nodes:
+        script += "; [p.NODE_CLASS_MAPPINGS[k] for k in p.NODE_CLASS_MAPPINGS]"
+    return script + "; print(time.perf_counter() - t)"
+
+
+def time_import(resolve_nodes = False):
+    ''' Seconds to import the package (and optionally load the nodes) in a new interpreter. '''
+    env = dict(os.environ, SDXL_SIZING_BANNER = "0")
+    out = subprocess.run([sys.executable, "-c", _script(resolve_nodes)], cwd = PARENT, env = env,
+                         capture_output = True, text = True, check = True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_modules(resolve_nodes = False, count = 10):
+    ''' (cumulative us, self us, module) for the slowest imports, from python -X importtime. '''
+    env = dict(os.environ, SDXL_SIZING_BANNER = "0")
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", _script(resolve_nodes)], cwd = PARENT, env = env,
+                         capture_output = True, text = True, check = True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    rows.sort(reverse = True)
+    return rows[:count]
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Measure the package's import time.")
+    parser.add_argument("--runs", type = int, default = 10)
+    parser.add_argument("--nodes", action = "store_true", help = "also load every node class")
+    parser.add_argument("--budget-ms", type = float, default = None, help = "fail if the median is above this")
+    args = parser.parse_args(argv)
+
+    times = [time_import(args.nodes) * 1000 for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f"import {PACKAGE}{' + nodes' if args.nodes else ''}: median {median:.2f} ms, min {min(times):.2f} ms, max {max(times):.2f} ms over {args.runs} runs")
+
+    print("\nslowest imports (cumulative us, self us):")
+    for cumulative, self_us, module in slowest_modules(args.nodes):
+        print(f"  {cumulative:>9} {self_us:>9}  {module}")
+
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"\nOVER BUDGET: {median:.2f} ms > {args.budget_ms:.2f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
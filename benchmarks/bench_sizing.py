@@ -0,0 +1,198 @@
+''' Benchmarks for the sizing hot paths: the string parsing, bucket lookup, find_fraction, and full get_sizes calls
+    across every bucketing mode, verbose level, extra_args flag and input format, plus the int/float node.
+
+    python benchmarks/bench_sizing.py                          # run and print a table
+    python benchmarks/bench_sizing.py --save baseline.json     # ... and save the results
+    python benchmarks/bench_sizing.py --compare baseline.json  # ... and fail if anything got slower
+
+    Each case is timed call by call, so the table shows latency percentiles as well as calls/sec. The result cache
+    is off unless you pass --cache, so the numbers are for the actual work. Timings from different machines
+    aren't comparable, so make the baseline on the machine you compare on.
+
+    --stages runs every case once more with the stage timers on (see instrumentation.py) and prints where the time
+    went inside each call.
+'''
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+from _common import import_module
+
+sizing = import_module("conditioning_sizing_for_SDXL")
+instrumentation = import_module("instrumentation")
+
+
+def _node_case(*args, **kwargs):
+    node = sizing.sizing_node()
+    return lambda: node.get_sizes(*args, **kwargs)
+
+
+def _unparsed_case(*args, **kwargs):
+    node = sizing.sizing_node_unparsed()
+    return lambda: node.get_sizes_unparsed(*args, **kwargs)
+
+
+def build_cases():
+    ''' {name: zero-argument callable}. Each dimension is varied on its own against the default inputs. '''
+    node = sizing.sizing_node()
+    cases = {}
+
+    # the pieces
+    for text in ("1024", "1:2", "1 by 2", "0.5", "1920x1080"):
+        cases[f"parse_res/{text}"] = lambda text = text: node.parse_res(text)
+    for mode in ("Report", "Comfy", "Small"):
+        cases[f"getRecommendedRes/{mode}"] = lambda mode = mode: node.getRecommendedRes(0.7, mode)
+    for name, value in (("nice", 0.5625), ("ugly", 0.7071067811865476), ("random", 2.718281828459045)):
+        cases[f"find_fraction/{name}"] = lambda value = value: node.find_fraction(value)
+    compile_uncached = sizing.compile_extra_args.__wrapped__
+    cases["compile_extra_args/uncached"] = lambda: compile_uncached("--nudge w 0.8 --sharp --shortside")
+    cases["compile_extra_args/cached"] = lambda: sizing.compile_extra_args("--nudge w 0.8 --sharp --shortside")
+
+    # get_sizes, one dimension at a time
+    default = ("1024", "16:9", "1920x1080", 0.0, 0.5)
+    for mode in sizing.bucketing_options():
+        cases[f"get_sizes/bucketing/{mode}"] = _node_case(*default, strict_bucketing = mode)
+    for verbose in ("disabled", "basic", "full"):
+        cases[f"get_sizes/verbose/{verbose}"] = _node_case(*default, verbose = verbose)
+    cases["get_sizes/fit_aspect_to_bucket"] = _node_case(*default, fit_aspect_to_bucket = "enabled")
+    for extra_args in ("--nocrop", "--nudge w 0.8", "--sharp", "--extrasharp", "--supersharp", "--shortside", "--equivalent", "--randomaspect", "--randomaspect 2x3 4x2"):
+        cases[f"get_sizes/extra_args/{extra_args}"] = _node_case(*default, extra_args = extra_args)
+    for aspect in ("16:9", "16x9", "16 by 16", "1.7777", "-1"):
+        cases[f"get_sizes/aspect/{aspect}"] = _node_case("1024", aspect, "1920x1080", 0.0, 0.5)
+    for original_res in ("1920", "1920x1080", "2.0"):
+        cases[f"get_sizes/original_res/{original_res}"] = _node_case("1024", "16:9", original_res, 0.0, 0.5)
+    for native_res in ("1024", "1000x1000", "1.0", "768"):
+        cases[f"get_sizes/native_res/{native_res}"] = _node_case(native_res, "16:9", "1920x1080", 0.0, 0.5)
+    cases["get_sizes/crop_extra"] = _node_case("1024", "16:9", "1920x1080", 0.1, 0.5)
+
+    # the int/float node
+    cases["get_sizes_unparsed/aspect"] = _unparsed_case(-1, -1, 1024, 1.7777777777777777, 1920, 1080, 0.0, 0.5)
+    cases["get_sizes_unparsed/gen_size"] = _unparsed_case(1344, 768, 1024, -1, -1, -1, 0.0, 0.5)
+    cases["get_sizes_unparsed/auto_original"] = _unparsed_case(-1, -1, 1024, 0.75, 1200, -1, 0.0, 0.5)
+    cases["get_sizes_numeric"] = lambda: sizing.get_sizes_numeric(1024, 16/9, (1920, 1080), 0.0, 0.5)
+
+    return cases
+
+
+def time_case(fn, calls, rounds):
+    ''' Per-call latencies in seconds (calls * rounds of them), after a short warm up. '''
+    for _ in range(min(calls, 100)):
+        fn()
+    perf_counter = time.perf_counter
+    samples = []
+    for _ in range(rounds):
+        for _ in range(calls):
+            start = perf_counter()
+            fn()
+            samples.append(perf_counter() - start)
+    return samples
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    pick = lambda q: samples[min(n - 1, int(q * n))]
+    total = sum(samples)
+    return {
+        "calls_per_sec": n / total if total else float("inf"),
+        "mean_us": total / n * 1e6,
+        "p50_us": pick(0.50) * 1e6,
+        "p90_us": pick(0.90) * 1e6,
+        "p99_us": pick(0.99) * 1e6,
+    }
+
+
+def compare(results, baseline, tolerance):
+    ''' Names of the cases whose median latency is more than tolerance (a fraction) above the baseline. '''
+    regressions = []
+    for name, stats in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        if stats["p50_us"] > old["p50_us"] * (1 + tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def stage_breakdown(cases, calls):
+    ''' {case: {stage: mean us per case call}}, from running each case with the stage timers on. '''
+    out = {}
+    for name, fn in cases.items():
+        instrumentation.timings.reset()
+        with instrumentation.instrumented(), contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(calls):
+                fn()
+        out[name] = {stage: stats["total_seconds"] / calls * 1e6 for stage, stats in instrumentation.timings.snapshot().items()}
+    return out
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Benchmark the sizing hot paths.")
+    parser.add_argument("--calls", type = int, default = 500, help = "calls per round (default 500)")
+    parser.add_argument("--rounds", type = int, default = 5, help = "rounds per case (default 5)")
+    parser.add_argument("--filter", default = "", help = "only run cases whose name contains this")
+    parser.add_argument("--cache", action = "store_true", help = "leave the result cache on")
+    parser.add_argument("--save", metavar = "PATH", help = "save the results as a JSON baseline")
+    parser.add_argument("--compare", metavar = "PATH", help = "compare against a saved baseline and exit 1 on a regression")
+    parser.add_argument("--tolerance", type = float, default = 0.25, help = "allowed slowdown in median latency (default 0.25 = 25%%)")
+    parser.add_argument("--stages", action = "store_true", help = "also show the time per stage inside each case")
+    args = parser.parse_args(argv)
+
+    if not args.cache:
+        sizing.sizes_cache.configure(maxsize = 0)
+
+    cases = {name: fn for name, fn in build_cases().items() if args.filter in name}
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding = "utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = {}
+    print(f"{'case':<48} {'calls/s':>11} {'p50 us':>9} {'p90 us':>9} {'p99 us':>9}  {'vs baseline':>11}")
+    for name, fn in cases.items():
+        # verbose cases print, which shouldn't end up in the table (the time spent printing still counts)
+        with contextlib.redirect_stdout(io.StringIO()):
+            samples = time_case(fn, args.calls, args.rounds)
+        stats = results[name] = summarize(samples)
+        change = ""
+        if baseline and name in baseline:
+            change = f"{(stats['p50_us'] / baseline[name]['p50_us'] - 1) * 100:+.1f}%"
+        print(f"{name:<48} {stats['calls_per_sec']:>11.0f} {stats['p50_us']:>9.2f} {stats['p90_us']:>9.2f} {stats['p99_us']:>9.2f}  {change:>11}")
+
+    if args.stages:
+        breakdown = stage_breakdown(cases, args.calls)
+        stages = list(instrumentation.STAGES)
+        print(f"\nmean us per call, by stage (stages nest, so they don't add up)\n{'case':<48}" + "".join(f"{s:>16}" for s in stages))
+        for name, per_stage in breakdown.items():
+            print(f"{name:<48}" + "".join(f"{per_stage[s]:>16.2f}" if s in per_stage else f"{'-':>16}" for s in stages))
+
+    if args.save:
+        with open(args.save, "w", encoding = "utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cache": args.cache,
+                "calls": args.calls,
+                "rounds": args.rounds,
+                "results": results,
+            }, f, indent = 2)
+        print(f"\nsaved baseline to {os.path.abspath(args.save)}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION: {len(regressions)} case(s) more than {args.tolerance:.0%} slower than the baseline (median latency):")
+            for name in regressions:
+                print(f"  {name}: {baseline[name]['p50_us']:.2f} us -> {results[name]['p50_us']:.2f} us")
+            return 1
+        print(f"\nno regressions beyond {args.tolerance:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+''' Micro-benchmark for the int/float node: the old path, which formatted its numbers into strings for get_sizes
+    to parse again, against calling get_sizes_numeric directly. The result cache is turned off so both sides do
+    the full calculation every time.
+
+    python benchmarks/bench_unparsed.py [--number N]
+'''
+import argparse
+import timeit
+
+from _common import import_module
+
+sizing = import_module("conditioning_sizing_for_SDXL")
+
+# (gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h)
+CASES = [
+    (-1, -1, 1024, 1.0, 1024, 1024),
+    (-1, -1, 1024, 0.5625, 1920, -1),
+    (1216, 832, 1024, -1, -1, -1),
+    (-1, -1, 1024, -1, 3000, 2000),
+    (-1, -1, 768, 1.7777777777777777, -1, 1080),
+]
+
+
+def string_round_trip(node, gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h):
+    # what get_sizes_unparsed used to do: build the strings the advanced node takes and hand them over
+    if gen_size_w > 0 and gen_size_h > 0:
+        if gen_size_w*gen_size_h < 0.9*native_res**2:
+            native_res = str(native_res)
+        else:
+            native_res = f"{gen_size_w}x{gen_size_h}"
+        if aspect == -1: aspect = gen_size_w/gen_size_h
+    else:
+        native_res = str(native_res)
+
+    if aspect != -1:
+        if original_res_h == -1 and original_res_w == -1:
+            original_res = f"{gen_size_w}x{gen_size_h}" if gen_size_w > 0 and gen_size_h > 0 else "1.0"
+        elif original_res_w == -1:
+            original_res = f"{int(aspect * original_res_h)}x{original_res_h}"
+        elif original_res_h == -1:
+            original_res = f"{original_res_w}x{int(original_res_w / aspect)}"
+        else:
+            original_res = f"{original_res_w}x{original_res_h}"
+    else:
+        original_res = f"{original_res_w}x{original_res_h}"
+        aspect = original_res_w/original_res_h
+
+    return node.get_sizes(native_res, str(aspect), original_res, 0.0, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__.split("\n")[0])
+    parser.add_argument("--number", type = int, default = 20000, help = "calls per case")
+    args = parser.parse_args()
+
+    sizing.sizes_cache.configure(maxsize = 0)
+    node = sizing.sizing_node_unparsed()
+
+    for case in CASES:
+        assert string_round_trip(node, *case) == node.get_sizes_unparsed(*case, 0.0, 0.0), case
+
+    old = timeit.timeit(lambda: [string_round_trip(node, *c) for c in CASES], number = args.number)
+    new = timeit.timeit(lambda: [node.get_sizes_unparsed(*c, 0.0, 0.0) for c in CASES], number = args.number)
+    calls = args.number * len(CASES)
+
+    print(f"string round trip:  {old / calls * 1e6:8.2f} us/call")
+    print(f"get_sizes_numeric:  {new / calls * 1e6:8.2f} us/call")
+    print(f"saved:              {(old - new) / calls * 1e6:8.2f} us/call ({(1 - new / old) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
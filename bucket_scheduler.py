@@ -0,0 +1,154 @@
+''' Groups pending generation jobs by the bucket they'll generate at, so they can be batched on the GPU. Latents
+    only batch together when they're the same size, and with strict bucketing on, every job lands on one of a
+    small set of bucket sizes. That makes a mixed queue very batchable once it's sorted by bucket.
+
+    Each job is sized with the sizing node when it's submitted. A bucket's batch goes out as soon as it's full, or
+    once its oldest job has waited max_wait seconds, whichever comes first.
+
+        scheduler = BucketScheduler(max_batch_size = 8, max_wait = 0.25)
+        batch = scheduler.submit(job_id, {"aspect": "16:9", "original_res": "1920x1080"})
+        if batch: run(batch)
+        for batch in scheduler.poll(): run(batch)
+'''
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from .conditioning_sizing_for_SDXL import REQUEST_DEFAULTS, as_node_string, sizing_node
+
+
+class Job(NamedTuple):
+    payload: Any
+    sizes: tuple            # the seven sizing node outputs
+    submitted_at: float
+
+
+class Batch(NamedTuple):
+    bucket: tuple           # (target_width, target_height)
+    jobs: tuple
+    reason: str             # "full", "timeout" or "flush"
+
+    @property
+    def size(self):
+        return len(self.jobs)
+
+
+class _BucketQueue:
+    __slots__ = ("jobs", "submitted", "batches", "batched_jobs")
+
+    def __init__(self):
+        self.jobs = []
+        self.submitted = 0
+        self.batches = 0
+        self.batched_jobs = 0
+
+
+class BucketScheduler:
+    ''' Queues jobs per bucket and hands them back as same-size batches.
+
+        max_batch_size - a bucket's batch goes out as soon as it has this many jobs.
+        max_wait - seconds the oldest job in a bucket can wait before its batch goes out anyway (None for no limit,
+            so only full batches or flush() send anything).
+        defaults - sizing node inputs used for anything a request doesn't give (e.g. strict_bucketing).
+        clock - where the time comes from, time.monotonic by default.
+    '''
+    def __init__(self, max_batch_size = 8, max_wait = 0.5, defaults = None, clock = time.monotonic):
+        if max_batch_size < 1:
+            raise ValueError("BucketScheduler: max_batch_size must be at least 1")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.defaults = dict(REQUEST_DEFAULTS)
+        self.defaults.update(defaults or {})
+        self.clock = clock
+        self._node = sizing_node()
+        self._queues = OrderedDict()
+
+    def size(self, request):
+        ''' The sizing node outputs for a request, which is a dict of the advanced node's inputs. Values can be the
+            node's strings, plain numbers or [width, height] pairs.
+        '''
+        inputs = dict(self.defaults)
+        inputs.update(request)
+        for name in ("native_res", "aspect", "original_res"):
+            inputs[name] = as_node_string(inputs[name])
+        return self._node.get_sizes(**inputs)
+
+    def submit(self, payload, request = None, sizes = None):
+        ''' Queues a job. Pass either the sizing request (see size()) or the seven outputs if you already have them.
+            Returns the bucket's Batch if this job filled it, otherwise None.
+        '''
+        if sizes is None:
+            sizes = self.size(request or {})
+        bucket = (sizes[4], sizes[5])
+
+        queue = self._queues.get(bucket)
+        if queue is None:
+            queue = self._queues[bucket] = _BucketQueue()
+        queue.jobs.append(Job(payload, sizes, self.clock()))
+        queue.submitted += 1
+
+        if len(queue.jobs) >= self.max_batch_size:
+            return self._take(bucket, queue, "full")
+        return None
+
+    def _take(self, bucket, queue, reason):
+        jobs = tuple(queue.jobs[:self.max_batch_size])
+        del queue.jobs[:self.max_batch_size]
+        queue.batches += 1
+        queue.batched_jobs += len(jobs)
+        return Batch(bucket, jobs, reason)
+
+    def poll(self):
+        ''' Batches for every bucket whose oldest job has waited at least max_wait. Oldest first. '''
+        if self.max_wait is None:
+            return []
+        now = self.clock()
+        ready = [(queue.jobs[0].submitted_at, bucket, queue) for bucket, queue in self._queues.items()
+                 if queue.jobs and now - queue.jobs[0].submitted_at >= self.max_wait]
+        ready.sort(key = lambda i: i[0])
+        return [self._take(bucket, queue, "timeout") for _, bucket, queue in ready]
+
+    def flush(self):
+        ''' Everything that's still queued, as batches (still at most max_batch_size each). '''
+        batches = []
+        for bucket, queue in self._queues.items():
+            while queue.jobs:
+                batches.append(self._take(bucket, queue, "flush"))
+        return batches
+
+    def next_deadline(self):
+        ''' The clock time when poll() will next have something, or None if nothing is waiting. '''
+        if self.max_wait is None:
+            return None
+        oldest = [queue.jobs[0].submitted_at for queue in self._queues.values() if queue.jobs]
+        return min(oldest) + self.max_wait if oldest else None
+
+    def __len__(self):
+        return sum(len(queue.jobs) for queue in self._queues.values())
+
+    def metrics(self):
+        ''' Per-bucket queue depth and counters, keyed by "WIDTHxHEIGHT". '''
+        now = self.clock()
+        out = {}
+        for (w, h), queue in self._queues.items():
+            out[f"{w}x{h}"] = {
+                "depth": len(queue.jobs),
+                "oldest_wait": now - queue.jobs[0].submitted_at if queue.jobs else 0.0,
+                "submitted": queue.submitted,
+                "batches": queue.batches,
+                "mean_batch_size": queue.batched_jobs / queue.batches if queue.batches else 0.0,
+            }
+        return out
+
+
+def schedule(requests, max_batch_size = 8, max_wait = 0.5, defaults = None, clock = time.monotonic):
+    ''' Runs a stream of (payload, request) pairs through a BucketScheduler and yields the batches as they become
+        ready. Timeouts are checked as each new request arrives, and whatever's left is flushed at the end.
+    '''
+    scheduler = BucketScheduler(max_batch_size, max_wait, defaults, clock)
+    for payload, request in requests:
+        batch = scheduler.submit(payload, request)
+        if batch is not None:
+            yield batch
+        yield from scheduler.poll()
+    yield from scheduler.flush()
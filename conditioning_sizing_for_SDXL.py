@@ -1,3 +1,1103 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import warnings
+from bisect import bisect_right
+from collections import OrderedDict
+from fractions import Fraction
+from functools import lru_cache
+from math import ulp
+from typing import NamedTuple, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+REPORT_BUCKETS = ((1600, 640), (896, 1088), (896, 1152), (1536, 640), (832, 1152), (832, 1216), (1472, 704), (1408, 704), (768, 1280), (768, 1344), (704, 1344), (704, 1408), (704, 1472), (1344, 768), (1280, 768), (640, 1536), (640, 1600), (1216, 832), (2048, 512), (1984, 512), (1152, 832), (1152, 896), (1920, 512), (1856, 512), (576, 1664), (576, 1728), (576, 1792), (1088, 896), (1088, 960), (1024, 960), (1024, 1024), (512, 1856), (512, 1920), (512, 1984), (512, 2048), (1792, 576), (960, 1024), (960, 1088), (1728, 576), (1664, 576))
+
+SMALL_BUCKETS = ((896, 1088), (832, 1152), (704, 1344), (1152, 832), (1856, 512), (576, 1664), (1088, 896), (512, 1856), (1664, 576))
+
+COMFY_BUCKETS = ((1024, 1024), (1152, 896), (896, 1152), (1216, 832), (832, 1216), (1344, 768), (768, 1344), (1536, 640), (640, 1536))
+# exact buckets recommended by Comfy—not as many of these! Must be that these had the most training data and produce the best results.
+
+
+class BucketIndex:
+    ''' A bucket table compiled for lookups. Buckets are grouped by their exact aspect ratio (as a Fraction), so
+        two buckets with the same ratio but different sizes are both kept instead of one overwriting the other.
+        Lookups bisect a sorted list of the float ratios, which are the same floats the old w/h dict keys were,
+        so the closest bucket is picked exactly as before.
+
+        native_res is the resolution the table was made for (the built in ones are all 1024), or None if the
+        table can be used at any native_res.
+    '''
+    __slots__ = ("name", "native_res", "buckets", "keys", "ratios", "groups")
+
+    def __init__(self, buckets, name = None, native_res = None):
+        groups = {}
+        for w, h in buckets:
+            w, h = int(w), int(h)
+            if w <= 0 or h <= 0:
+                raise ValueError(f"BucketIndex: invalid bucket {w}x{h}")
+            groups.setdefault(Fraction(w, h), []).append((w, h))
+
+        if not groups:
+            raise ValueError("BucketIndex: no buckets given")
+
+        self.name = name
+        self.native_res = native_res
+        self.buckets = tuple(b for group in groups.values() for b in group)
+        self.keys = tuple(sorted(groups))
+        self.ratios = [k.numerator / k.denominator for k in self.keys]
+        self.groups = tuple(tuple(groups[k]) for k in self.keys)
+
+    def __len__(self):
+        return len(self.buckets)
+
+    def __repr__(self):
+        return f"BucketIndex({self.name!r}, {len(self.buckets)} buckets)"
+
+    def nearest(self, aspect):
+        ''' Position of the ratio closest to aspect, in self.keys/self.ratios/self.groups. '''
+        ratios = self.ratios
+        i = bisect_right(ratios, aspect)
+        if i == len(ratios):
+            return i - 1
+        if i == 0:
+            return 0
+        # ties go to the lower ratio, same as the old linear scan
+        return i if abs(ratios[i] - aspect) < abs(ratios[i - 1] - aspect) else i - 1
+
+    def lookup(self, aspect, area = None):
+        ''' The bucket closest to aspect. If more than one bucket has that ratio, area picks the one closest
+            in pixel count (otherwise it's the first one listed).
+        '''
+        group = self.groups[self.nearest(aspect)]
+        if area is None or len(group) == 1:
+            return group[0]
+        return min(group, key = lambda b: abs(b[0] * b[1] - area))
+
+
+def read_bucket_file(path):
+    ''' Reads a list of buckets from a .json or .csv file. Returns (buckets, name, native_res).
+
+        JSON can either be a plain list of [width, height] pairs, or an object like
+            {"name": "my buckets", "native_res": 768, "buckets": [[768, 768], [640, 896], ...]}
+        If an object has no "buckets", they're generated (see generate_buckets) from its native_res and optional
+        "step" and "aspect_range" ([min, max]).
+        CSV is one width,height pair per row. A header row is skipped.
+        If no name is given the file name (without the extension) is used.
+    '''
+    name = os.path.splitext(os.path.basename(path))[0]
+    native_res = None
+
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            name = data.get("name", name)
+            native_res = data.get("native_res")
+            if "buckets" not in data:
+                min_aspect, max_aspect = data.get("aspect_range", (0.25, 4.0))
+                return list(generate_buckets(int(native_res), int(data.get("step", 64)), float(min_aspect), float(max_aspect))), name, native_res
+            data = data["buckets"]
+        buckets = [(int(w), int(h)) for w, h in data]
+    elif path.lower().endswith(".csv"):
+        buckets = []
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.reader(f):
+                row = [i.strip() for i in row if i.strip() != ""]
+                if not row or row[0].startswith("#"):
+                    continue
+                if not row[0].isdigit():
+                    # header
+                    continue
+                buckets.append((int(row[0]), int(row[1])))
+    else:
+        raise ValueError(f"read_bucket_file: unsupported file type: {path}")
+
+    return buckets, name, native_res
+
+
+# every table the nodes can bucket to, by name. The built in ones use the short mode names from get_sizes.
+bucket_tables = {}
+
+# the strict_bucketing input names for the built in tables
+BUCKET_MODE_NAMES = {"SDXL Report": "Report", "Comfy": "Comfy", "Smallest Buckets": "Small", "disabled": False}
+
+# custom tables are picked up from here on first use
+BUCKET_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bucket_tables")
+_user_tables_loaded = False
+# held while the registry changes, so the first lookups from several threads load the custom tables only once
+_registry_lock = threading.RLock()
+
+
+def register_bucket_table(name, buckets, native_res = None, replace = False):
+    ''' Compiles a list of (width, height) buckets and registers it so that it can be used as a strict_bucketing
+        mode. Returns the compiled BucketIndex.
+    '''
+    if name in BUCKET_MODE_NAMES and BUCKET_MODE_NAMES[name] != name:
+        raise ValueError(f"register_bucket_table: '{name}' is a reserved bucketing mode name")
+    index = BucketIndex(buckets, name = name, native_res = native_res)
+    with _registry_lock:
+        if name in bucket_tables and not replace:
+            raise ValueError(f"register_bucket_table: a table named '{name}' is already registered")
+        bucket_tables[name] = index
+        # cached and precomputed results may have come from the table this one replaces
+        if replace:
+            sizes_cache.clear()
+            _drop_stale_precomputed_tables()
+    return index
+
+
+def _drop_stale_precomputed_tables():
+    stale = [table for table in precomputed_tables if not table.buckets_match()]
+    for table in stale:
+        precomputed_tables.remove(table)
+        print(f"sizing_node: stopped using sizing table {table!r}, it was built with buckets that have been replaced")
+
+
+def load_bucket_table(path, name = None, replace = False):
+    ''' Reads a .json or .csv bucket file (see read_bucket_file) and registers it. '''
+    buckets, file_name, native_res = read_bucket_file(path)
+    return register_bucket_table(name or file_name, buckets, native_res = native_res, replace = replace)
+
+
+def load_bucket_tables(directory = None):
+    ''' Registers every .json/.csv file in directory (by default the bucket_tables folder next to this file).
+        Files that can't be read are reported and skipped so one bad file doesn't break the node.
+    '''
+    global _user_tables_loaded
+    with _registry_lock:
+        if directory is None:
+            directory = BUCKET_TABLE_DIR
+            # set once they're all in, so no other thread goes ahead with half of them
+            loaded = _load_bucket_table_dir(directory)
+            _user_tables_loaded = True
+            return loaded
+        return _load_bucket_table_dir(directory)
+
+
+def _load_bucket_table_dir(directory):
+    if not os.path.isdir(directory):
+        return []
+
+    loaded = []
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.lower().endswith((".json", ".csv")):
+            continue
+        try:
+            buckets, name, native_res = read_bucket_file(os.path.join(directory, file_name))
+            # replace = True so editing a file and reloading works, but that mustn't swap out a built in table
+            if name in BUCKET_MODE_NAMES or name in BUCKET_MODE_NAMES.values():
+                raise ValueError(f"'{name}' is the name of a built in table, give the table another name")
+            loaded.append(register_bucket_table(name, buckets, native_res = native_res, replace = True))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"sizing_node: couldn't load bucket table {file_name}: {e}")
+    return loaded
+
+
+def _load_user_tables():
+    if not _user_tables_loaded:
+        with _registry_lock:
+            if not _user_tables_loaded:
+                load_bucket_tables()
+
+
+def get_bucket_table(mode):
+    ''' The compiled BucketIndex for a mode name ("Report", "Comfy", "Small" or a custom table name). '''
+    _load_user_tables()
+    return bucket_tables[mode]
+
+
+class _LegacyBuckets:
+    # the class attributes sizing_node used to keep its bucket tables in, rebuilt from the registry when they're
+    # read: {w/h: (w, h)} for the ...ResDict names and the sorted ratios for the get...ResIndex ones
+    def __init__(self, mode, kind):
+        self.mode = mode
+        self.kind = kind
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner = None):
+        warnings.warn(f"sizing_node.{self.name} is deprecated, use get_bucket_table('{self.mode}') instead", DeprecationWarning, stacklevel = 2)
+        table = get_bucket_table(self.mode)
+        if self.kind == "index":
+            return list(table.ratios)
+        return {ratio: group[0] for ratio, group in zip(table.ratios, table.groups)}
+
+
+def bucketing_options():
+    ''' The choices for the strict_bucketing input: the built in tables, then custom ones, then "disabled". '''
+    _load_user_tables()
+    builtin = [i for i in BUCKET_MODE_NAMES if i != "disabled"]
+    custom = [i for i in bucket_tables if i not in BUCKET_MODE_NAMES.values()]
+    return builtin + custom + ["disabled"]
+
+
+@lru_cache(maxsize=None)
+def generate_buckets(native_res = 1024, step = 64, min_aspect = 0.25, max_aspect = 4.0, min_area = 0.9):
+    ''' Every (width, height) made of multiples of step, with an area between min_area * native_res**2 and
+        native_res**2 and an aspect ratio between min_aspect and max_aspect, sorted by aspect ratio. That's the
+        rule the SDXL report's buckets follow, so at 1024 this gives back the report's table, plus 1344x704 (the
+        report has 704x1344 but leaves out its mirror).
+
+        native_res is rounded to the nearest multiple of step first. The area window only reaches down, so a
+        native_res just under a multiple (1023, or the 1000 of a 1000x1048 pair) would otherwise lose the square
+        bucket and every other one right at the top of the window.
+    '''
+    if native_res <= 0 or step <= 0:
+        raise ValueError(f"generate_buckets: native_res and step must be positive (got {native_res}, {step})")
+    if not 0 < min_aspect <= max_aspect:
+        raise ValueError(f"generate_buckets: invalid aspect range {min_aspect} to {max_aspect}")
+
+    native_res = round(native_res / step) * step
+    max_pixels = native_res * native_res
+    min_pixels = min_area * max_pixels
+    buckets = []
+    for w in range(step, int((max_pixels * max_aspect)**(1/2)) + step, step):
+        # the heights that could fit, give or take a step, then the exact checks
+        lo = max(min_pixels / w, w / max_aspect) // step * step
+        hi = min(max_pixels / w, w / min_aspect) // step * step + step
+        for h in range(max(int(lo), step), int(hi) + 1, step):
+            if min_pixels <= w * h <= max_pixels and min_aspect <= w / h <= max_aspect:
+                buckets.append((w, h))
+    buckets.sort(key = lambda b: (b[0] / b[1], b[0]))
+    return tuple(buckets)
+
+
+@lru_cache(maxsize=64)
+def generated_bucket_table(native_res, step = 64, min_aspect = 0.25, max_aspect = 4.0):
+    ''' generate_buckets compiled into a BucketIndex, or None if no buckets fit (a tiny native_res). '''
+    buckets = generate_buckets(native_res, step, min_aspect, max_aspect)
+    if not buckets:
+        return None
+    return BucketIndex(buckets, name = f"generated {native_res}", native_res = native_res)
+
+
+@lru_cache(maxsize=64)
+def scaled_bucket_table(table, native_res, step = 64):
+    ''' A custom table made for another native_res, scaled to native_res: each bucket is multiplied by
+        native_res / table.native_res and rounded to multiples of step, so the table keeps its shapes.
+    '''
+    scale = native_res / table.native_res
+    buckets = dict.fromkeys((max(step, round(w * scale / step) * step), max(step, round(h * scale / step) * step)) for w, h in table.buckets)
+    return BucketIndex(buckets, name = f"{table.name} scaled to {native_res}", native_res = native_res)
+
+
+def bucket_table_for(mode, native_res):
+    ''' The BucketIndex that mode buckets to at native_res, so strict bucketing works at any resolution. A built in
+        table made for some other native_res is swapped for the buckets generated at native_res (None if there
+        aren't any), and a custom one is scaled to it.
+    '''
+    table = get_bucket_table(mode)
+    if table.native_res is None or table.native_res == native_res:
+        return table
+    if mode in BUCKET_MODE_NAMES.values():
+        return generated_bucket_table(native_res)
+    return scaled_bucket_table(table, native_res)
+
+
+def simplest_fraction(lo, hi, max_denominator = 10000):
+    ''' The fraction with the smallest numerator and denominator in [lo, hi] (0 < lo <= hi), found by walking
+        the continued fractions of both ends until they split, which is the same as going down the Stern-Brocot
+        tree but taking whole runs of steps at once. Returns (numerator, denominator), or None if the answer
+        would need a denominator bigger than max_denominator.
+
+        The denominators grow at least as fast as the Fibonacci numbers, so this never takes more than about
+        log_phi(max_denominator) + 2 steps however awkward lo and hi are.
+    '''
+    ln, ld = lo.as_integer_ratio()
+    hn, hd = hi.as_integer_ratio()
+    return _simplest_fraction(ln, ld, hn, hd, max_denominator)
+
+
+def _simplest_fraction(ln, ld, hn, hd, max_denominator):
+    # simplest_fraction with lo = ln/ld and hi = hn/hd kept as plain ints, since Fraction arithmetic is slow
+    if ln * hd > hn * ld or ln <= 0:
+        return None
+    h0, h1 = 0, 1
+    k0, k1 = 1, 0
+    while k1 <= max_denominator:
+        a = ln // ld
+        if a * ld == ln or (a + 1) * hd <= hn:
+            # there's a whole number in [lo, hi], so this is where the expansions split
+            t = a if a * ld == ln else a + 1
+            if t*k1 + k0 > max_denominator:
+                return None
+            return (t*h1 + h0, t*k1 + k0)
+        h0, h1 = h1, a*h1 + h0
+        k0, k1 = k1, a*k1 + k0
+        # lo, hi = 1 / (hi - a), 1 / (lo - a)
+        ln, ld, hn, hd = hd, hn - a*hd, ld, ln - a*ld
+    return None
+
+
+def _below_float(x):
+    # x - ulp(x)/2 as an integer ratio: the lowest value that still rounds to the float x
+    n, d = x.as_integer_ratio()
+    un, ud = ulp(x).as_integer_ratio()
+    return (n*2*ud - un*d, d*2*ud)
+
+
+def best_fraction(decimal, max_denominator = 1000000):
+    ''' Turns a float into a nice ratio, e.g. 0.5625 -> (9, 16), for verbose reporting. The answer is the simplest
+        fraction that rounds to the same number of decimal places you gave it (up to 5), so 1.78 gives 16:9 but
+        1.7778 gives 16:9 as well. Returns (numerator, denominator).
+
+        The bounds are never narrower than 0.00001, so there's always a fraction in them with a denominator of at
+        most 100000, and with the default max_denominator this gives the same ratio as the old find_fraction loop
+        (e.g. 2.44445 -> 25745:10532). Only a smaller max_denominator can leave nothing in the bounds, and then it
+        falls back to the closest fraction with a denominator that size, which can be outside them.
+    '''
+    if decimal < 0:
+        n, d = best_fraction(-decimal, max_denominator)
+        return (-n, d)
+
+    decimal = round(decimal, 5)
+    if decimal == 0:
+        return (0, 1)
+
+    x = str(decimal)
+    xf = len(x) - (x.find(".") + 1)
+    tolerance = 10**(-xf-1)*5
+    bounds = (decimal - tolerance, decimal + tolerance)
+
+    # the bounds are floats, so anything that would round onto them counts as on them. The top end is open, so
+    # then nudge it down by less than the gap to any fraction below it with a small enough denominator.
+    ln, ld = _below_float(bounds[0])
+    hn, hd = _below_float(bounds[1])
+    m = max_denominator * hd + 1
+    hn, hd = hn*m - hd, hd*m
+    if ln * (max_denominator + 1) < ld:
+        ln, ld = 1, max_denominator + 1
+
+    found = _simplest_fraction(ln, ld, hn, hd, max_denominator)
+    if found is None:
+        f = Fraction(decimal).limit_denominator(max_denominator)
+        return (f.numerator, f.denominator)
+
+    # that's the smallest numerator that fits. With that numerator, prefer the denominator that lands closest
+    # to the decimal (so 0.1 is 1:10, not 1:7).
+    n = found[0]
+    d = round(n / decimal)
+    if d > 0 and bounds[0] <= n / d < bounds[1]:
+        return (n, d)
+    return found
+
+
+class SizingOptions(NamedTuple):
+    ''' The options from the extra_args input, after parsing. These are immutable (and hashable) so one can be
+        shared by every call with the same extra_args string, and used as part of a cache key.
+
+        errors holds an ExtraArgsError for each argument that couldn't be used. Those arguments are ignored, the
+        rest still apply.
+    '''
+    sharp: float = 0.0                      # multiplier for the width/height conditioning, 0.0 for none
+    nudge: tuple = ("w", 0.0)               # (side, amount)
+    nocrop: bool = False
+    side: int = 0                           # what an int original_res means: 0 long side, 1 short side, 2 equivalent area
+    randomaspect: Optional[tuple] = None    # (min, max) when --randomaspect is given
+    errors: tuple = ()
+
+
+class ExtraArgsError(ValueError):
+    ''' A problem with one argument in extra_args. arg is the argument's name (without the "--", or None if the
+        problem isn't tied to one) and values is what was given after it.
+    '''
+    def __init__(self, arg, values, message):
+        self.arg = arg
+        self.values = tuple(values)
+        self.message = message
+        super().__init__(f"--{arg}: {message}" if arg else message)
+
+
+def _parse_ratio(text):
+    # "0.5", "1:2", "1x2", "1*2" or "1/2" -> 0.5
+    for sep in (":", "x", "*", "/"):
+        if sep in text:
+            x, y = text.split(sep, 1)
+            return float(x) / float(y)
+    return float(text)
+
+
+def _arg_flag(field, value):
+    def apply(values, options):
+        options[field] = value
+        return values
+    return apply
+
+
+def _arg_nudge(values, options):
+    if len(values) < 2:
+        raise ValueError("expects a side and an amount, e.g. --nudge w 0.8")
+    # as it always has, any side but "w" nudges the height
+    if values[0] not in ("w", "h"):
+        logger.warning("sizing_node: --nudge side '%s' isn't w or h, nudging the height", values[0])
+    options["nudge"] = ("w" if values[0] == "w" else "h", float(values[1]))
+    return values[2:]
+
+
+def _arg_randomaspect(values, options):
+    if not values:
+        options["randomaspect"] = (0.25, 4.0)
+        return
+    if len(values) < 2:
+        raise ValueError("expects either no limits or a minimum and a maximum, e.g. --randomaspect 2x3 4x2")
+    options["randomaspect"] = (_parse_ratio(values[0]), _parse_ratio(values[1]))
+    return values[2:]
+
+
+# the extra_args grammar: "--name value value ...". Each handler gets the values after its flag and returns any it
+# didn't use, which are ignored with a warning. Where flags conflict (--sharp and --supersharp, say) the one further
+# down this list wins, whatever order they're typed in.
+EXTRA_ARGS = {
+    "nocrop": _arg_flag("nocrop", True),
+    "nudge": _arg_nudge,
+    "sharp": _arg_flag("sharp", 1.33),
+    "extrasharp": _arg_flag("sharp", 1.67),
+    "supersharp": _arg_flag("sharp", 2.0),
+    "equivalent": _arg_flag("side", 2),
+    "shortside": _arg_flag("side", 1),
+    "randomaspect": _arg_randomaspect,
+}
+
+
+@lru_cache(maxsize = 256)
+def compile_extra_args(extra_args):
+    ''' Parses an extra_args string into a SizingOptions. The result is cached per string, so the node only does
+        this once for each distinct extra_args it sees. Problems are logged (once) and kept in options.errors.
+    '''
+    if not extra_args.strip():
+        return SizingOptions()
+
+    # split into (name, [values]) groups
+    args = []
+    errors = []
+    for token in extra_args.split():
+        if token.startswith("--"):
+            args.append((token[2:], []))
+        elif args:
+            args[-1][1].append(token)
+        else:
+            errors.append(ExtraArgsError(None, (token,), f"'{token}' doesn't follow an argument"))
+
+    fields = {}
+    given = {name: values for name, values in args}
+    for name in given:
+        if name not in EXTRA_ARGS:
+            errors.append(ExtraArgsError(name, given[name], "unknown argument"))
+
+    for name, handler in EXTRA_ARGS.items():
+        if name not in given:
+            continue
+        try:
+            unused = handler(given[name], fields)
+        except (ValueError, ZeroDivisionError) as e:
+            errors.append(ExtraArgsError(name, given[name], str(e)))
+            continue
+        if unused:
+            logger.warning("sizing_node: --%s: ignoring unused values %s", name, " ".join(unused))
+
+    for e in errors:
+        logger.warning("sizing_node: ignoring invalid extra argument: %s", e)
+
+    return SizingOptions(errors = tuple(errors), **fields)
+
+
+class SizingCache:
+    ''' A bounded memo of get_sizes results, keyed on the parsed inputs. policy is "lru" (a hit moves the entry
+        to the back of the line) or "fifo" (entries leave in the order they came in). maxsize = 0 turns it off.
+        Call stats() to see how well it's doing. It's safe to share between threads.
+    '''
+    POLICIES = ("lru", "fifo")
+
+    def __init__(self, maxsize = 4096, policy = "lru"):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxsize = 0
+        self.policy = "lru"
+        self.configure(maxsize, policy)
+        self.reset_stats()
+
+    def configure(self, maxsize = None, policy = None):
+        if policy is not None and policy not in self.POLICIES:
+            raise ValueError(f"SizingCache: unknown eviction policy '{policy}', expected one of {self.POLICIES}")
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("SizingCache: maxsize can't be negative")
+        with self._lock:
+            if policy is not None:
+                self.policy = policy
+            if maxsize is not None:
+                self.maxsize = maxsize
+                self._trim()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bypasses = 0
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        # the lookup, the move to the back and the counters happen together, so another thread's eviction can't
+        # drop the key in between
+        with self._lock:
+            result = self._data.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.policy == "lru":
+                self._data.move_to_end(key)
+            return result
+
+    def put(self, key, result):
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = result
+            self._trim()
+
+    def bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def _trim(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last = False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            hits, misses, evictions, bypasses, size = self.hits, self.misses, self.evictions, self.bypasses, len(self._data)
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "bypasses": bypasses,
+            "size": size,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+
+# shared by every sizing node. Use sizes_cache.configure(maxsize = ..., policy = ...) to change it.
+sizes_cache = SizingCache()
+
+# precomputed results, tried before the cache (see lookup_table.py). Each one has a get() that takes
+# get_sizes_numeric's inputs and returns the seven outputs, or None for inputs it doesn't cover, and a
+# buckets_match() that says whether the buckets it was built with are still the registered ones.
+precomputed_tables = []
+
+
+register_bucket_table("Report", REPORT_BUCKETS, native_res = 1024)
+register_bucket_table("Comfy", COMFY_BUCKETS, native_res = 1024)
+register_bucket_table("Small", SMALL_BUCKETS, native_res = 1024)
+
+
+def make_64(num):
+    num = int(num)
+    return num // 64 * 64 if num % 64 < 32 else (num + 1) // 64 * 64
+
+
+def normalize_aspect(aspect, original_res):
+    ''' aspect as a float. A (w, h) tuple becomes w/h, the int -1 takes the aspect from original_res (if that's a
+        (w, h) tuple, otherwise it's 1.0) and anything else <= 0 becomes 1.0.
+    '''
+    if isinstance(aspect, tuple):
+        return aspect[0]/aspect[1]
+    elif aspect == -1 and isinstance(aspect, int):
+        if isinstance(original_res, tuple):
+            return original_res[0]/original_res[1]
+        return 1.0
+    elif aspect <= 0:
+        return 1.0
+    return float(aspect)
+
+
+# unseeded --randomaspect draws come from a generator per thread rather than the global random state, so threads
+# never share one
+_local = threading.local()
+
+
+def _thread_rng():
+    rng = getattr(_local, "rng", None)
+    if rng is None:
+        rng = _local.rng = random.Random()
+    return rng
+
+
+def random_aspect(limits, seed = None):
+    ''' A random aspect ratio between limits[0] and limits[1]. The same seed always gives the same aspect. '''
+    rng = _thread_rng() if seed is None else random.Random(seed)
+    return rng.random()*(limits[1]-limits[0])+limits[0]
+
+
+def sizing_key(native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, fit_aspect_to_bucket = False, strict_bucketing = "SDXL Report", extra_args = "", seed = None):
+    ''' The inputs of get_sizes_numeric normalized into a tuple: equal tuples always give equal sizes. This is the
+        result cache's key and what the nodes' IS_CHANGED hashes. With --randomaspect the aspect is drawn from
+        seed here, so without a seed the key is different every time.
+    '''
+    options = compile_extra_args(extra_args) if isinstance(extra_args, str) else extra_args
+    if options.randomaspect is not None:
+        aspect = random_aspect(options.randomaspect, seed)
+    else:
+        aspect = normalize_aspect(aspect, original_res)
+    bucketMode = BUCKET_MODE_NAMES.get(strict_bucketing, strict_bucketing)
+    fit_aspect_to_bucket = fit_aspect_to_bucket is True or fit_aspect_to_bucket == "enabled"
+    # "2" and "2.0" mean different things for original_res but compare equal, so the type goes in the key too
+    return (native_res, aspect, type(original_res), original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, bucketMode, options)
+
+
+# what parsing and sizing raise for inputs that can't be sized ("1:0", "abc"...). IS_CHANGED catches these and
+# leaves them for the node to report.
+BAD_INPUT_ERRORS = (ValueError, TypeError, ZeroDivisionError)
+
+
+def sizing_hash(native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, verbose = "disabled", fit_aspect_to_bucket = False, strict_bucketing = "SDXL Report", extra_args = "", seed = None):
+    ''' IS_CHANGED for the sizing nodes: a hash of the sizing_key for get_sizes_numeric's inputs. It's NaN (which
+        never equals itself, so ComfyUI always runs the node) only for --randomaspect with no seed, which is meant
+        to give a new aspect every time. verbose doesn't count: turning it on shouldn't make the sampler and
+        everything else after the node run again on every queue, so the report prints whenever the node does run.
+    '''
+    key = sizing_key(native_res, aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+    if key[8].randomaspect is not None and seed is None:
+        return float("nan")
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def get_sizes_numeric(native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, verbose = "disabled", fit_aspect_to_bucket = False, strict_bucketing = "SDXL Report", extra_args = "", seed = None):
+    ''' The sizing node without the string parsing. Takes numbers and gives back the same seven outputs as
+        sizing_node.get_sizes:
+            native_res - int
+            aspect - float, int or (w, h) tuple (see normalize_aspect)
+            original_res - int (long side), float (multiple of the generation size) or (width, height) tuple
+        strict_bucketing takes the node's names ("SDXL Report", ...) or a bucket table name. fit_aspect_to_bucket
+        can be a bool or the node's "enabled"/"disabled". extra_args can be a string or an already compiled
+        SizingOptions. seed picks the aspect for --randomaspect (None for a fresh one each call).
+    '''
+    if precomputed_tables and verbose == "disabled":
+        for table in precomputed_tables:
+            result = table.get(native_res, aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args)
+            if result is not None:
+                return result
+
+    # by now "1:2", "2:4" and "0.5" are all the same input, so they share a cache entry
+    key = sizing_key(native_res, aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+    native_res, aspect, _, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, bucketMode, options = key
+
+    # unseeded random aspects and verbose reporting skip the cache, since they're meant to do something each time
+    if verbose != "disabled" or (options.randomaspect is not None and seed is None):
+        sizes_cache.bypass()
+        return compute_sizes(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, bucketMode, options)
+
+    result = sizes_cache.get(key)
+    if result is None:
+        result = compute_sizes(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, bucketMode, options)
+        sizes_cache.put(key, result)
+    return result
+
+
+class SizingReport(NamedTuple):
+    ''' Everything verbose reporting shows, as plain values. Nothing is formatted until format(), as_dict() or
+        to_json() is called, so building one is cheap.
+    '''
+    native_res: int
+    aspect: float               # after fit_aspect_to_bucket
+    width: int
+    height: int
+    crop_w: int
+    crop_h: int
+    target_width: int
+    target_height: int
+    downscale: float
+    notes: tuple                # anything worth knowing about the bucketing, e.g. why it was turned off
+    crops: tuple                # (x, y) pixels cropped to fit the bucket, before crop_extra
+    postscale: tuple            # (width, height, factor, exact fit) of the original after scaling to the bucket
+    crops_extra: tuple          # (x, y) pixels removed by crop_extra
+    downscale_unscaled: float   # downscale before downscale_effect was applied
+    crop_extra: float
+    downscale_effect: float
+
+    @property
+    def sizes(self):
+        ''' The seven node outputs. '''
+        return (self.width, self.height, self.crop_w, self.crop_h, self.target_width, self.target_height, self.downscale)
+
+    @property
+    def aspect_ratio(self):
+        ''' The aspect as the simplest fraction, (numerator, denominator). '''
+        return best_fraction(self.aspect)
+
+    def cost(self, batch_size = 1, precision = "fp16", model = None):
+        ''' CostEstimate for generating batch_size images at this target size (see estimate_cost). '''
+        return estimate_cost(self.target_width, self.target_height, batch_size, precision, model)
+
+    def format(self, verbose = "full"):
+        ''' The text verbose = "basic" or "full" shows. '''
+        if verbose == "basic":
+            return f'''width: {self.width}
+height: {self.height}
+crop_w: {self.crop_w}
+crop_h: {self.crop_h}
+target_width: {self.target_width}
+target_height: {self.target_height}
+downscale: {self.downscale}'''
+
+        width, height, target_width, target_height, downscale = self.width, self.height, self.target_width, self.target_height, self.downscale
+        v_aspect = self.aspect_ratio
+
+        # scaling to fit bucketing
+        scaling_line = f"Original dimensions: {width}x{height}\n - scaled by factor of {self.postscale[2]} to {self.postscale[0]}x{self.postscale[1]}."
+
+        # cropping data
+        crop_line = ""
+        if self.crops == (0, 0):
+            crop_line = "No cropping required."
+        else:
+            crop_line = f'{max(*self.crops)//2} pixels cropped from {"left and right sides" if self.crops[0] > self.crops[1] else "top and bottom"} to fit.'
+        if self.crop_extra > 0:
+            crop_line += f'\n - additional {self.crops_extra[0]}, {self.crops_extra[1]} pixels removed from width, height.'
+
+        downscale_line = ""
+        #downscale
+        if self.downscale_effect > 0:
+            if self.downscale_effect == 1.0:
+                downscale_line = f"Scale resulting image by {downscale}"
+            else:
+                downscale_line = f"Scale resulting image by {downscale} ({self.downscale_unscaled}, effect strength {int(100*round(self.downscale_effect, 2))}%)"
+            downscale_line += f"\n Final image size: {int(downscale*target_width)}x{int(downscale*target_height)}"
+
+        notes = "".join(f"\nsizing_node: {note}\n" for note in self.notes)
+        return notes + f'''
+---- Sizing Data (debug) 
+ native resolution: {int(self.native_res)}
+ aspect ratio: {v_aspect[0]}:{v_aspect[1]}
+ Generation size of {target_width}x{target_height}
+ {scaling_line}
+ {crop_line}
+ {downscale_line}
+
+---- Output Values
+ width: {width}
+ height: {height}
+ target_width: {target_width}
+ target_height: {target_height}
+ crop_w: {self.crop_w}
+ crop_h: {self.crop_h}
+ downscale: {downscale}
+
+* disable verbose on the sizing node to hide this information.
+'''
+
+    def as_dict(self, batch_size = 1, precision = "fp16"):
+        ''' The report as JSON-friendly values, with the aspect ratio as "n:d" too, and the cost of generating
+            batch_size images at the target size.
+        '''
+        out = self._asdict()
+        for name in ("notes", "crops", "postscale", "crops_extra"):
+            out[name] = list(out[name])
+        n, d = self.aspect_ratio
+        out["aspect_ratio"] = f"{n}:{d}"
+        cost = self.cost(batch_size, precision)
+        out["cost"] = {"batch_size": batch_size, "precision": precision, "latent_shape": list(cost.latent_shape), "vram_gb": cost.vram_gb, "relative_cost": cost.relative_cost}
+        return out
+
+    def to_json(self, batch_size = 1, precision = "fp16"):
+        return json.dumps(self.as_dict(batch_size, precision))
+
+
+class _FormattedReport:
+    # only formats the report if a log handler actually wants the message
+    __slots__ = ("report", "verbose")
+
+    def __init__(self, report, verbose):
+        self.report = report
+        self.verbose = verbose
+
+    def __str__(self):
+        return self.report.format(self.verbose)
+
+
+def log_report(report, verbose = "full"):
+    ''' Logs a SizingReport at INFO, formatted only if something is listening. If logging hasn't been set up at
+        all (a plain Python script), the report is printed the way the node always has.
+    '''
+    if logger.hasHandlers():
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("%s", _FormattedReport(report, verbose))
+    else:
+        print(report.format(verbose))
+
+
+def get_sizing_report(native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, fit_aspect_to_bucket = False, strict_bucketing = "SDXL Report", extra_args = "", seed = None):
+    ''' Same inputs as get_sizes_numeric (minus verbose), but returns a SizingReport with the working shown. '''
+    native_res, aspect, _, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, bucketMode, options = sizing_key(
+        native_res, aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+    return compute_sizes(native_res, aspect, original_res, crop_extra, downscale_effect, "disabled", fit_aspect_to_bucket, bucketMode, options, report = True)
+
+
+def compute_sizes(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, bucketMode, options, report = False):
+    ''' The actual sizing math, with no parsing and no caching. native_res is an int, aspect a float (already
+        normalized), original_res an int, float or (width, height) tuple, fit_aspect_to_bucket a bool, bucketMode
+        a bucket table name (or False) and options a SizingOptions.
+
+        With report = True this returns a SizingReport instead of the seven outputs. With verbose on, the report
+        is logged (see log_report).
+    '''
+    sharp, nudge, nocrop, side = options.sharp, options.nudge, options.nocrop, options.side
+
+    # initialize the variables for reporting. These are only filled in if there's going to be a report.
+    notes = []
+    v_crops = None
+    v_crops_extra = None
+    v_postscale = None
+    v = report or verbose != "disabled"
+    bucket = bool(bucketMode)
+    table = None
+
+    #initialize some vars
+    width, height, target_width, target_height, crop_w, crop_h, downscale = None, None, None, None, None, None, None
+
+    if not 4.0 >= aspect >= 0.25:
+        bucket = False
+        if v: notes.append("No actual training bucket for this aspect ratio. Exact bucketing disabled.")
+    elif bucket:
+        table = bucket_table_for(bucketMode, native_res)
+        if table is None:
+            bucket = False
+            if v: notes.append(f"No buckets at native_res {native_res}. Exact bucketing disabled.")
+        elif table.native_res != get_bucket_table(bucketMode).native_res:
+            if v: notes.append(f"the {bucketMode} buckets are for native_res {get_bucket_table(bucketMode).native_res}, using {'them scaled to' if bucketMode not in BUCKET_MODE_NAMES.values() else 'buckets generated for'} {native_res}")
+
+
+    # match the buckets
+    target_width, target_height = None, None
+    if not bucket:
+        c = (native_res**2 / aspect)**(1/2)
+        target_width = make_64(c * aspect)
+        target_height = make_64(c)
+    else:
+        # fit exactly to the actual training buckets, not to a theoretical training bucket
+        target_width, target_height = table.lookup(aspect, native_res**2)
+
+    if fit_aspect_to_bucket:
+        aspect = target_width/target_height   # adjust aspect to match the generation size
+
+    # parse the original resolution input -> width, height
+    if isinstance(original_res, float):
+        width, height = int(original_res * target_width), int(original_res * target_height)
+    elif isinstance(original_res, tuple):
+        width, height = original_res
+    else:
+        if side == 1:
+            if target_width > target_height:
+                width = int(original_res * aspect)
+                height = original_res
+            else:
+                width = original_res
+                height = int(original_res / aspect)
+        elif side == 2:
+            height = (original_res**2/aspect)**(1/2)
+            width = height*aspect
+            width, height = int(width), int(height)
+        else:
+            if target_width > target_height:
+                width = original_res
+                height = int(original_res / aspect)
+            else:
+                width = int(original_res * aspect)
+                height = original_res
+
+    # optional "nudge" argument overrides width or height to give a desired amount of 'plausible' cropping.
+    if nudge[1] != 0.0:
+        if nudge[0] == "w":
+            width = int(round((height/target_height) * (target_width + nudge[1]*32)))
+        else:
+            height = int(round((width/target_width) * (target_height + nudge[1]*32)))
+
+
+    # calculate cropping. This also calculates and stores values for verbose reporting on how the cropping was done after scaling in the 'hypothetical' training image.
+    if nocrop:
+        # optional extra argument to force crop sizes to 0, if this is preferred. This may be useful for A/B testing.
+        if v: v_crops, v_postscale = (0, 0), (target_width, target_height, target_width/width, True)
+        crop_w = 0
+        crop_h = 0
+        downscale = min(width/target_width, height/target_height)
+    else:
+        if width/height == target_width/target_height:
+            if v: v_crops, v_postscale = (0, 0), (target_width, target_height, target_width/width, True)
+            crop_w = int(target_width*crop_extra)//2
+            crop_h = int(target_height*crop_extra)//2
+            downscale = (1-crop_extra) * width / target_width
+        elif width/height > target_width/target_height:
+            x0 = int(width * target_height/height)
+            x1 = x0 - target_width
+            if v: v_crops, v_postscale = (x1, 0), (x0, target_height, target_height/height, False)
+            crop_w = int(x1 + target_width * crop_extra)//2
+            crop_h = int(target_height*crop_extra)//2
+            downscale = (1-crop_extra) * height / target_height
+        else:
+            x0 = int(height * target_width/width)
+            x1 = x0 - target_height
+            if v: v_crops, v_postscale = (0, x1), (target_width, x0, target_width/width, False)
+            crop_w = int(target_width*crop_extra)//2
+            crop_h = int(x1 + target_height * crop_extra)//2
+            downscale = (1-crop_extra) * width/target_width
+
+    if sharp:
+        width, height = int(width*sharp), int(height*sharp)
+
+    if v: v_crops_extra = (int(target_width*(crop_extra))//2, int(target_height*(crop_extra))//2)
+
+    downscale_unscaled = downscale
+    downscale = min(1 - ((1 - downscale) * downscale_effect), 1.0) # don't output for upscaling, since that should be handled in a different way.
+
+    if v:
+        result = SizingReport(native_res, aspect, width, height, crop_w, crop_h, target_width, target_height, downscale,
+                              tuple(notes), v_crops, v_postscale, v_crops_extra, downscale_unscaled, crop_extra, downscale_effect)
+        if verbose != "disabled":
+            log_report(result, verbose)
+        if report:
+            return result
+
+    #fin
+    return (width, height, crop_w, crop_h, target_width, target_height, downscale)
+
+
+# rough weight sizes for the SDXL UNet + text encoders + VAE, in GB, by precision
+WEIGHTS_GB = {"fp32": 10.4, "fp16": 5.2, "bf16": 5.2, "fp8": 2.8}
+# activations stay 16 bit with fp8 weights, and double with fp32
+ACTIVATION_SCALE = {"fp32": 2.0, "fp16": 1.0, "bf16": 1.0, "fp8": 1.0}
+
+
+class CostEstimate(NamedTuple):
+    latent_shape: tuple     # (batch, 4, height / 8, width / 8)
+    vram_gb: float
+    relative_cost: float    # UNet work per step compared with one 1024x1024 image
+
+
+class CostModel(NamedTuple):
+    ''' How generation cost grows with size. With r = pixels / reference_pixels, per image:
+            relative cost = unet_linear * r + unet_attention * r**2
+            VRAM = weights + batch * (activation_linear_gb * r + activation_attention_gb * r**2) * precision scale
+        The attention terms are the part that grows with the square of the token count. The defaults are ballpark
+        SDXL numbers; fit your own with calibrate_cost_model.
+    '''
+    unet_linear: float = 0.7
+    unet_attention: float = 0.3
+    activation_linear_gb: float = 0.9
+    activation_attention_gb: float = 0.3
+    weights_gb: Optional[float] = None    # None to use WEIGHTS_GB for the precision
+    reference_pixels: int = 1024 * 1024
+
+    def relative_cost(self, width, height, batch_size = 1):
+        r = width * height / self.reference_pixels
+        return batch_size * (self.unet_linear * r + self.unet_attention * r * r)
+
+    def vram_gb(self, width, height, batch_size = 1, precision = "fp16"):
+        if precision not in WEIGHTS_GB:
+            raise ValueError(f"CostModel: unknown precision '{precision}', expected one of {tuple(WEIGHTS_GB)}")
+        r = width * height / self.reference_pixels
+        weights = WEIGHTS_GB[precision] if self.weights_gb is None else self.weights_gb
+        return weights + batch_size * (self.activation_linear_gb * r + self.activation_attention_gb * r * r) * ACTIVATION_SCALE[precision]
+
+    def estimate(self, width, height, batch_size = 1, precision = "fp16"):
+        return CostEstimate(latent_shape(width, height, batch_size), self.vram_gb(width, height, batch_size, precision), self.relative_cost(width, height, batch_size))
+
+
+def latent_shape(width, height, batch_size = 1):
+    ''' The shape of the SDXL latent for a generation size: (batch, 4 channels, height / 8, width / 8). '''
+    return (batch_size, 4, height // 8, width // 8)
+
+
+def _fit_two(xs, ys, targets):
+    # least squares for target = a * x + b * y, by the 2x2 normal equations
+    sxx = sum(x * x for x in xs)
+    syy = sum(y * y for y in ys)
+    sxy = sum(x * y for x, y in zip(xs, ys))
+    sxt = sum(x * t for x, t in zip(xs, targets))
+    syt = sum(y * t for y, t in zip(ys, targets))
+    det = sxx * syy - sxy * sxy
+    if abs(det) < 1e-12:
+        raise ValueError("calibrate_cost_model: need measurements at two or more different sizes")
+    return (sxt * syy - syt * sxy) / det, (syt * sxx - sxt * sxy) / det
+
+
+def calibrate_cost_model(rows, reference_pixels = 1024 * 1024):
+    ''' Fits a CostModel to measurements. rows are dicts with width, height and seconds (time per step or per
+        image, anything proportional), and optionally vram_gb, batch_size and precision for the memory fit.
+    '''
+    rows = list(rows)
+    rs = [int(row["width"]) * int(row["height"]) / reference_pixels for row in rows]
+    fields = {"reference_pixels": reference_pixels}
+
+    timed = [(r, float(row["seconds"]) / float(row.get("batch_size", 1))) for r, row in zip(rs, rows) if row.get("seconds") not in (None, "")]
+    if timed:
+        a, b = _fit_two([r for r, _ in timed], [r * r for r, _ in timed], [t for _, t in timed])
+        # scale so a 1024x1024 image costs exactly 1.0
+        fields["unet_linear"], fields["unet_attention"] = a / (a + b), b / (a + b)
+
+    measured = [(r, row) for r, row in zip(rs, rows) if row.get("vram_gb") not in (None, "")]
+    if measured:
+        xs, ys, targets = [], [], []
+        for r, row in measured:
+            precision = row.get("precision") or "fp16"
+            scale = float(row.get("batch_size", 1)) * ACTIVATION_SCALE[precision]
+            xs.append(scale * r)
+            ys.append(scale * r * r)
+            targets.append(float(row["vram_gb"]) - WEIGHTS_GB[precision])
+        fields["activation_linear_gb"], fields["activation_attention_gb"] = _fit_two(xs, ys, targets)
+
+    return CostModel(**fields)
+
+
+def load_cost_table(path, reference_pixels = 1024 * 1024):
+    ''' calibrate_cost_model from a .csv (with a header row naming the columns) or a .json list of objects. '''
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    return calibrate_cost_model(rows, reference_pixels)
+
+
+# used by the cost node and estimate_cost unless told otherwise
+cost_model = CostModel()
+
+
+def estimate_cost(width, height, batch_size = 1, precision = "fp16", model = None):
+    ''' CostEstimate for generating batch_size images at width x height (the target_width/target_height). '''
+    return (model or cost_model).estimate(width, height, batch_size, precision)
+
+
+def estimate_costs(sizes, batch_size = 1, precision = "fp16", model = None):
+    ''' estimate_cost over many candidate (width, height) sizes. Sizes that repeat are only worked out once. '''
+    model = model or cost_model
+    seen = {}
+    out = []
+    for size in sizes:
+        estimate = seen.get(size)
+        if estimate is None:
+            estimate = seen[size] = model.estimate(size[0], size[1], batch_size, precision)
+        out.append(estimate)
+    return out
+
+
 class sizing_node:
     ''' This node takes native resolution, aspect ratio, and original resolution. It uses these to 
         calculate and output the latent generator dimensions in an appropriate bucketed resolution with 64-multiples 
@@ -31,18 +1131,16 @@ class sizing_node:
             - "2.0" - returns dimensions double those of the generation. So if you're generating at 1024x1024,
                 this will return 2048x2048.
     '''
-    reportResBase = [(1600, 640), (896, 1088), (896, 1152), (1536, 640), (832, 1152), (832, 1216), (1472, 704), (1408, 704), (768, 1280), (768, 1344), (704, 1344), (704, 1408), (704, 1472), (1344, 768), (1280, 768), (640, 1536), (640, 1600), (1216, 832), (2048, 512), (1984, 512), (1152, 832), (1152, 896), (1920, 512), (1856, 512), (576, 1664), (576, 1728), (576, 1792), (1088, 896), (1088, 960), (1024, 960), (1024, 1024), (512, 1856), (512, 1920), (512, 1984), (512, 2048), (1792, 576), (960, 1024), (960, 1088), (1728, 576), (1664, 576)]
-    reportResDict = {i[0]/i[1]: i for i in reportResBase}
-    getReportResIndex = sorted([i for i in reportResDict])
-
-    smallResBase = [(896, 1088), (832, 1152), (704, 1344), (1152, 832), (1856, 512), (576, 1664), (1088, 896), (512, 1856), (1664, 576)]
-    smallResDict = {i[0]/i[1]: i for i in smallResBase}
-    getSmallResIndex = sorted([i for i in smallResDict])
-
-    comfyResBase = [(1024, 1024), (1152, 896), (896, 1152), (1216, 832), (832, 1216), (1344, 768), (768, 1344), (1536, 640), (640, 1536)]
-    comfyResDict = {i[0]/i[1]: i for i in comfyResBase}
-    getComfyResIndex = sorted([i for i in comfyResDict])
-    # exact buckets recommended by Comfy—not as many of these! Must be that these had the most training data and produce the best results.
+    reportResBase = REPORT_BUCKETS
+    smallResBase = SMALL_BUCKETS
+    comfyResBase = COMFY_BUCKETS
+    # the lookup indexes for these live in bucket_tables, along with any custom tables.
+    reportResDict = _LegacyBuckets("Report", "dict")
+    getReportResIndex = _LegacyBuckets("Report", "index")
+    smallResDict = _LegacyBuckets("Small", "dict")
+    getSmallResIndex = _LegacyBuckets("Small", "index")
+    comfyResDict = _LegacyBuckets("Comfy", "dict")
+    getComfyResIndex = _LegacyBuckets("Comfy", "index")
 
 
 
@@ -81,11 +1179,16 @@ class sizing_node:
             "optional":{
                 "verbose": (["disabled", "basic", "full"],),
                 "fit_aspect_to_bucket": (["disabled", "enabled"],),
-                "strict_bucketing": (["SDXL Report", "Comfy", "Smallest Buckets", "disabled"],),
+                "strict_bucketing": (bucketing_options(),),
                 "extra_args": ("STRING", {
                     "multiline": True,
                     "default": ""
-                    })
+                    }),
+                "seed": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 0xffffffffffffffff
+                })
 
             }
         }
@@ -118,347 +1221,67 @@ class sizing_node:
         else:
             return int(striptext)
 
-    def getRecommendedRes(self, aspect, mode = "Report"):
-        getIndex = None
-        resDict = None
-        if mode == "Comfy":
-            getIndex = self.getComfyResIndex
-            resDict = self.comfyResDict
-        elif mode == "Report":
-            getIndex = self.getReportResIndex
-            resDict = self.reportResDict
-        elif mode == "Small":
-            getIndex = self.getSmallResIndex
-            resDict = self.smallResDict
-
-
-
-        # This will return the closest valid resolution.
-        c = 0
-        for i in getIndex:
-            if i > aspect:
-                if abs(i-aspect) < abs(c-aspect):
-                    return resDict[i]
-                else:
-                    if c != 0:
-                        return resDict[c]
-                    else:
-                        return resDict[c]
-            c = i
-
-        # if none were < aspect, return the last one
-        return resDict[getIndex[-1]]
+    def getRecommendedRes(self, aspect, mode = "Report", area = None):
+        # This will return the closest valid resolution. mode is the name of a table in bucket_tables.
+        return get_bucket_table(mode).lookup(aspect, area)
 
     def make_64(self, num):
-        num = int(num)
-        return num // 64 * 64 if num % 64 < 32 else (num + 1) // 64 * 64
+        return make_64(num)
 
     def find_fraction(self, decimal):
-        ''' A bit silly/wasteful, but this is for describing aspect ratio to anons who put in a float value and
-            want verbose reporting. It just iterates over all ints, starting at 1, until it finds one where 
-            n / round(n/aspect) is close enough to the given decimal, and 'close enough' is defined according to
-            how many decimal points you give it, to a maximum of 5. (Without a maximum this could get very slow.)
-
-            Maybe this is adding some bloat but I think it's fun. It shouldn't get called if you don't choose to 
-            turn on "verbose".
+        ''' For describing aspect ratio to anons who put in a float value and want verbose reporting. See
+            best_fraction, this just keeps the old name around.
         '''
-        decimal = round(decimal, 5)
-
-        x = str(decimal)
-        xf =len(x) - (x.find(".") + 1)
-        tolerance = 10**(-xf-1)*5
-        bounds = (decimal - tolerance, decimal + tolerance)
-
-        i = 0
-        past0 = False
-        while past0 == False:
-            i += 1
-            if round(i/decimal) == 0.0:
-                continue
-            else:
-                past0 = True
-                t = i / round(i/decimal)
-                if bounds[0] <= t < bounds[1]:
-                    return (i, int(round(i/decimal)))
-
-        while True:
-            i+= 1
-            t = i / round(i/decimal)
-            if bounds[0] <= t < bounds[1]:
-                return (i, int(round(i/decimal)))
-
-
-    def get_sizes(self, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = ""):
-        
-        sharp = False
-        nudge = ("w", 0.0)
-        nocrop = False
-        override_aspect = False
-        bucketMode = {"Comfy": "Comfy", "SDXL Report": "Report", "Smallest Buckets": "Small", "disabled": False}[strict_bucketing]
-        side = False
-
-        if extra_args != "":
-
-            try:
-                splitargs = extra_args.split(" ")
-                args = []
-                for i in splitargs:
-                    if i[:2] == "--":
-                        args.append((i[2:],))
-                    elif i != "":
-                        args[-1] += (i, )
-
-                # make it into a quickly searchable dictionary (in case I add lots of optional arguments... lol)
-                args = {i[0]: i[1:] if len(i) > 1 else None for i in args}
-
-                # check each argument individually. could do a dict of functions for speed but there aren't many arguments.
-                if "nocrop" in args: nocrop = True
-                if "nudge" in args:
-                    nudge = (args["nudge"][0], float(args["nudge"][1]))
-                if "sharp" in args:
-                    sharp = 1.33
-                if "extrasharp" in args:
-                    sharp = 1.67
-                if "supersharp" in args:
-                    sharp = 2.0
-                if "shortside" in args:
-                    side = 1
-                elif "equivalent" in args:
-                    side = 2
-
-                if "randomaspect" in args:
-                    from random import random
-                    aspect_limits = [0.25, 4.0]
-
-                    # if additonal arguments are given, use them as limits
-                    try:
-                        aspect_limits = list(args["randomaspect"])
-                    except:
-                        pass
-
-                    r = ()
-
-                    #parse the inputs to floats
-                    for i in aspect_limits:
-                        corrected = ""
-                        split = False
-                        for c in i:
-                            if c in {":", "x", "*", "/"}:
-                                corrected += "*"
-                                split = True
-                            else:
-                                corrected += c
-                        if split:
-                            x, y = corrected.split("*")
-                            r += (float(x)/float(y),)
-                        else:
-                            r += (float(corrected), )
-                    override_aspect = random()*(r[1]-r[0])+r[0]
-
-            except:
-                print("sizing_node: Invalid extra arguments, skipping.")
-
-        # initialize the verbose variables for reporting
-        v_aspect = None
-        v_crops = None
-        v_crops_extra = None
-        v_postscale = None
-        v_downscale = None
-        v = verbose == "full"
-        bucket = False if strict_bucketing == "disabled" else True
+        return best_fraction(decimal)
 
+    def parse_extra_args(self, extra_args):
+        ''' Reads the extra_args string into a SizingOptions. See compile_extra_args. '''
+        return compile_extra_args(extra_args)
 
+    @classmethod
+    def IS_CHANGED(s, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0):
+        # same result whenever the inputs mean the same thing, so ComfyUI can keep its cached outputs. Bad inputs
+        # are left for get_sizes to report.
+        try:
+            native_res, aspect, original_res = s().parse_inputs(native_res, aspect, original_res)
+            return sizing_hash(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+        except BAD_INPUT_ERRORS:
+            return float("nan")
+
+    def get_sizes(self, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0):
+        native_res, aspect, original_res = self.parse_inputs(native_res, aspect, original_res)
+        return get_sizes_numeric(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, self.parse_extra_args(extra_args), seed)
+
+    def parse_inputs(self, native_res, aspect, original_res):
+        ''' The string inputs as get_sizes_numeric takes them: (native_res int, aspect, original_res). '''
         # turn these string inputs into tuples, ints, or floats
         native_res = self.parse_res(native_res)
         aspect = self.parse_res(aspect)
         original_res = self.parse_res(original_res)
 
-        #initialize some vars
-        width, height, target_width, target_height, crop_w, crop_h, downscale = None, None, None, None, None, None, None
-
-
         # parse the native_res input -> int
         if isinstance(native_res, tuple):
             native_res = int((native_res[0] * native_res[1])**(1/2))
         elif isinstance(native_res, float):
             native_res = int(native_res * 1024)
 
+        return native_res, aspect, original_res
 
-        # if aspect is specified as random, then override it.
-        if override_aspect:
-            aspect = override_aspect
-
-        # parse the aspect input -> float
-        else:
-            if isinstance(aspect, tuple):
-                if v: v_aspect = aspect
-                aspect = aspect[0]/aspect[1]
-            elif aspect == -1 and isinstance(aspect, int):
-                if isinstance(original_res, tuple):
-                    aspect = original_res[0]/original_res[1]
-                else:
-                    aspect = 1.0
-            elif aspect <= 0:
-                aspect = 1.0
-
-        if not 4.0 >= aspect >= 0.25:
-            bucket = False
-            if v: print("\nsizing_node: No actual training bucket for this aspect ratio. Exact bucketing disabled.")
-        elif native_res != 1024:
-            bucket = False
-            if v: print("\nsizing_node: strict_bucketing disabled (native_res != 1024)")
-        
-
-        # match the buckets
-        target_width, target_height = None, None
-        if not bucket:
-            c = (native_res**2 / aspect)**(1/2)
-            target_width = self.make_64(c * aspect)
-            target_height = self.make_64(c)
-        else:
-            # fit exactly to the actual training buckets, not to a theoretical training bucket
-            target_width, target_height = self.getRecommendedRes(aspect, mode = bucketMode)
-
-        if fit_aspect_to_bucket == "enabled":
-            aspect = target_width/target_height   # adjust aspect to match the generation size
-
-
-        if v:
-            v_aspect = self.find_fraction(aspect)
-
-        # parse the original resolution input -> width, height
-        if isinstance(original_res, float):
-            width, height = int(original_res * target_width), int(original_res * target_height)
-        elif isinstance(original_res, tuple):
-            width, height = original_res
-        else:
-            if side == 1:
-                if target_width > target_height:
-                    width = int(original_res * aspect)
-                    height = original_res
-                else:
-                    width = original_res
-                    height = int(original_res / aspect)
-            elif side == 2:
-                height = (original_res**2/aspect)**(1/2)
-                width = height*aspect
-                width, height = int(width), int(height)
-            else:
-                if target_width > target_height:
-                    width = original_res
-                    height = int(original_res / aspect)
-                else:
-                    width = int(original_res * aspect)
-                    height = original_res
-
-        # optional "nudge" argument overrides width or height to give a desired amount of 'plausible' cropping.
-        if nudge[1] != 0.0:
-            if nudge[0] == "w":
-                width = int(round((height/target_height) * (target_width + nudge[1]*32)))
-            else:
-                height = int(round((width/target_width) * (target_height + nudge[1]*32)))
-
-
-        # calculate cropping. This also calculates and stores values for verbose reporting on how the cropping was done after scaling in the 'hypothetical' training image.
-        if nocrop:
-            # optional extra argument to force crop sizes to 0, if this is preferred. This may be useful for A/B testing.
-            if v: v_crops, v_postscale = (0, 0), (target_width, target_height, target_width/width, True)
-            crop_w = 0
-            crop_h = 0
-            downscale = min(width/target_width, height/target_height)
-        else:
-            if width/height == target_width/target_height:
-                if v: v_crops, v_postscale = (0, 0), (target_width, target_height, target_width/width, True)
-                crop_w = int(target_width*crop_extra)//2
-                crop_h = int(target_height*crop_extra)//2
-                downscale = (1-crop_extra) * width / target_width
-            elif width/height > target_width/target_height:
-                x0 = int(width * target_height/height)
-                x1 = x0 - target_width
-                if v: v_crops, v_postscale = (x1, 0), (x0, target_height, target_height/height, False)
-                crop_w = int(x1 + target_width * crop_extra)//2
-                crop_h = int(target_height*crop_extra)//2
-                downscale = (1-crop_extra) * height / target_height
-            else:
-                x0 = int(height * target_width/width)
-                x1 = x0 - target_height
-                if v: v_crops, v_postscale = (0, x1), (target_width, x0, target_width/width, False)
-                crop_w = int(target_width*crop_extra)//2
-                crop_h = int(x1 + target_height * crop_extra)//2
-                downscale = (1-crop_extra) * width/target_width
-
-        if sharp:
-            width, height = int(width*sharp), int(height*sharp)
-
-        if v: v_crops_extra = (int(target_width*(crop_extra))//2, int(target_height*(crop_extra))//2)
-
-        if v: v_downscale = (downscale,)
-        downscale = min(1 - ((1 - downscale) * downscale_effect), 1.0) # don't output for upscaling, since that should be handled in a different way.
-        if v: 
-            v_downscale += (downscale,)
 
-        if verbose == "basic":
-            print(f'''width: {width}
-height: {height}
-crop_w: {crop_w}
-crop_h: {crop_h}
-target_width: {target_width}
-target_height: {target_height}
-downscale: {downscale}''')
-
-        elif verbose == "full":
-
-            # scaling to fit bucketing
-            scaling_line = f"Original dimensions: {width}x{height}\n - scaled by factor of {v_postscale[2]} to {v_postscale[0]}x{v_postscale[1]}."
-
-
-
-
-            # cropping data
-            crop_line = ""
-            if v_crops == (0, 0):
-                crop_line = "No cropping required."
-            else:
-                crop_line = f'{max(*v_crops)//2} pixels cropped from {"left and right sides" if v_crops[0] > v_crops[1] else "top and bottom"} to fit.'
-            if crop_extra > 0:
-                crop_line += f'\n - additional {v_crops_extra[0]}, {v_crops_extra[1]} pixels removed from width, height.'
-
-            downscale_line = ""
-            #downscale
-            if downscale_effect > 0:
-                if downscale_effect == 1.0:
-                    downscale_line = f"Scale resulting image by {v_downscale[1]}"
-                else:
-                    downscale_line = f"Scale resulting image by {v_downscale[1]} ({v_downscale[0]}, effect strength {int(100*round(downscale_effect, 2))}%)"
-                downscale_line += f"\n Final image size: {int(downscale*target_width)}x{int(downscale*target_height)}"
-
-            #print
-            print(
-f'''
----- Sizing Data (debug) 
- native resolution: {int(native_res)}
- aspect ratio: {v_aspect[0]}:{v_aspect[1]}
- Generation size of {target_width}x{target_height}
- {scaling_line}
- {crop_line}
- {downscale_line}
-
----- Output Values
- width: {width}
- height: {height}
- target_width: {target_width}
- target_height: {target_height}
- crop_w: {crop_w}
- crop_h: {crop_h}
- downscale: {downscale}
-
-* disable verbose on the sizing node to hide this information.
-'''
-                )
+# the advanced node's outputs and inputs by name, for the tools that take sizing requests as dicts (the command
+# line sizer, the sizing service, the scheduler...), and the inputs they fill in when a request leaves one out
+SIZE_FIELDS = sizing_node.RETURN_NAMES
+REQUEST_FIELDS = ("native_res", "aspect", "original_res", "crop_extra", "downscale_effect", "fit_aspect_to_bucket", "strict_bucketing", "extra_args", "seed")
+REQUEST_DEFAULTS = {"native_res": "1024", "aspect": "1:1", "original_res": "1.0", "crop_extra": 0.0, "downscale_effect": 0.0, "fit_aspect_to_bucket": "disabled", "strict_bucketing": "SDXL Report", "extra_args": "", "seed": 0}
 
 
-        #fin
-        return (width, height, crop_w, crop_h, target_width, target_height, downscale)
+def as_node_string(value):
+    ''' A request value as the string the node's text inputs take: a [w, h] pair becomes "WxH", anything else str(). '''
+    if isinstance(value, (list, tuple)):
+        if len(value) != 2:
+            raise ValueError(f"expected a [width, height] pair, got {value!r}")
+        return f"{value[0]}x{value[1]}"
+    return str(value)
 
 
 class sizing_node_basic(sizing_node):
@@ -489,6 +1312,43 @@ class sizing_node_basic(sizing_node):
             }
         }
 
+class sizing_node_report(sizing_node):
+    ''' The advanced node with more outputs: everything verbose "full" would show, as a JSON string (see
+        SizingReport.as_dict), and what the generation will cost for batch_size images at precision (the same
+        numbers as the cost node, which are also in the JSON). Handy for feeding the working into other nodes,
+        saving it with the image, or deciding whether a job fits before queueing it.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        types = sizing_node.INPUT_TYPES()
+        types["optional"]["batch_size"] = ("INT", {
+            "default": 1,
+            "max": 4096,
+            "min": 1,
+            "step": 1
+        })
+        types["optional"]["precision"] = (list(WEIGHTS_GB), {"default": "fp16"})
+        return types
+
+    RETURN_TYPES = sizing_node.RETURN_TYPES + ("STRING", "FLOAT", "FLOAT")
+    RETURN_NAMES = sizing_node.RETURN_NAMES + ("report", "vram_gb", "relative_cost")
+
+    FUNCTION = "get_sizes_report"
+
+    @classmethod
+    def IS_CHANGED(s, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0, batch_size = 1, precision = "fp16"):
+        changed = super().IS_CHANGED(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+        return changed if changed != changed else f"{changed}:{batch_size}:{precision}"
+
+    def get_sizes_report(self, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0, batch_size = 1, precision = "fp16"):
+        native_res, aspect, original_res = self.parse_inputs(native_res, aspect, original_res)
+        report = get_sizing_report(native_res, aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, self.parse_extra_args(extra_args), seed)
+        if verbose != "disabled":
+            log_report(report, verbose)
+        cost = report.cost(batch_size, precision)
+        return report.sizes + (report.to_json(batch_size, precision), round(cost.vram_gb, 2), round(cost.relative_cost, 3))
+
+
 class sizing_node_unparsed(sizing_node):
 
     def __init__(self):
@@ -555,51 +1415,109 @@ class sizing_node_unparsed(sizing_node):
                 "extra_args": ("STRING", {
                     "multiline": True,
                     "default": ""
-                    })
+                    }),
+                "seed": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 0xffffffffffffffff
+                })
 
             }
         }
 
     FUNCTION = "get_sizes_unparsed"
 
-    def get_sizes_unparsed(self, gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = ""):
+    @classmethod
+    def IS_CHANGED(s, gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0):
+        try:
+            native_res, aspect, original_res = s().parse_inputs_unparsed(gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h)
+            return sizing_hash(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+        except BAD_INPUT_ERRORS:
+            return float("nan")
+
+    def get_sizes_unparsed(self, gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h, crop_extra = 0.0, downscale_effect = 1.0, verbose = "disabled", fit_aspect_to_bucket = "disabled", strict_bucketing = "SDXL Report", extra_args = "", seed = 0):
+        native_res, aspect, original_res = self.parse_inputs_unparsed(gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h)
+        return get_sizes_numeric(native_res, aspect, original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, self.parse_extra_args(extra_args), seed)
+
+    def parse_inputs_unparsed(self, gen_size_w, gen_size_h, native_res, aspect, original_res_w, original_res_h):
+        ''' The int/float inputs as get_sizes_numeric takes them: (native_res int, aspect float, original_res). '''
+        # these all go straight to get_sizes_numeric, so nothing gets turned into a string and parsed back again.
         original_res = None
         if gen_size_w > 0 and gen_size_h > 0:
             # if the gen sizes are too far below the native resolution to be appropriate for generation
-            if (gen_size_w)*(gen_size_h) < 0.9*native_res**2:
-                native_res = str(native_res)
-            else:
-                native_res = f"{gen_size_w}x{gen_size_h}"
+            if (gen_size_w)*(gen_size_h) >= 0.9*native_res**2:
+                native_res = int((gen_size_w * gen_size_h)**(1/2))
             if aspect == -1: aspect = gen_size_w/gen_size_h
-        else:
-            native_res = str(native_res)
 
         if aspect != -1:
             if original_res_h == -1 and original_res_w == -1:
                 if gen_size_w > 0 and gen_size_h > 0:
-                    original_res = f"{gen_size_w}x{gen_size_h}"
+                    original_res = (gen_size_w, gen_size_h)
                 else:
-                    original_res = "1.0"
+                    original_res = 1.0
             elif original_res_w == -1:
-                original_res = f"{int(aspect * original_res_h)}x{original_res_h}"
+                original_res = (int(aspect * original_res_h), original_res_h)
             elif original_res_h == -1:
-                original_res = f"{original_res_w}x{int(original_res_w / aspect)}"
+                original_res = (original_res_w, int(original_res_w / aspect))
             else:
-                original_res = f"{original_res_w}x{original_res_h}"
+                original_res = (original_res_w, original_res_h)
         else:
             if original_res_h == -1 and original_res_w == -1:
-                    original_res = "1.0"
+                    original_res = 1.0
             elif original_res_w == -1:
-                original_res = f"{original_res_h}x{original_res_h}"
+                original_res = (original_res_h, original_res_h)
             elif original_res_h == -1:
-                original_res = f"{original_res_w}x{original_res_w}"
+                original_res = (original_res_w, original_res_w)
             else:
-                original_res = f"{original_res_w}x{original_res_h}"
+                original_res = (original_res_w, original_res_h)
 
             aspect = 1.0 if original_res_h == -1 or original_res_w == -1 else original_res_w/original_res_h
 
+        return int(native_res), float(aspect), original_res
+
+
+class sizing_cost_node:
+    ''' What a generation size will cost: the latent it makes, a rough VRAM figure for the batch and precision,
+        and the UNet work per step compared with one 1024x1024 image. Wire the sizing node's target_width and
+        target_height into it.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "target_width": ("INT", {
+                    "default": 1024,
+                    "max": 16384,
+                    "min": 64,
+                    "step": 8
+                }),
+                "target_height": ("INT", {
+                    "default": 1024,
+                    "max": 16384,
+                    "min": 64,
+                    "step": 8
+                }),
+                "batch_size": ("INT", {
+                    "default": 1,
+                    "max": 4096,
+                    "min": 1,
+                    "step": 1
+                }),
+                "precision": (list(WEIGHTS_GB), {"default": "fp16"}),
+            }
+        }
+
+    RETURN_TYPES = ("INT", "INT", "FLOAT", "FLOAT")
+    RETURN_NAMES = ("latent_width", "latent_height", "vram_gb", "relative_cost")
+
+    FUNCTION = "estimate"
+
+    CATEGORY = "sizing"
 
-        return self.get_sizes(native_res, str(aspect), original_res, crop_extra, downscale_effect, verbose, fit_aspect_to_bucket, strict_bucketing, extra_args)
+    def estimate(self, target_width, target_height, batch_size = 1, precision = "fp16"):
+        cost = estimate_cost(target_width, target_height, batch_size, precision)
+        _, _, latent_height, latent_width = cost.latent_shape
+        return (latent_width, latent_height, round(cost.vram_gb, 2), round(cost.relative_cost, 3))
 
 
 
@@ -659,6 +1577,65 @@ class get_aspect_from_image():
         return (f"{width}x{height}", width, height)
 
 
+class get_aspect_from_latent:
+    ''' The pixel size a LATENT decodes to, read from the shape of its samples (no decoding). SDXL's VAE scales by
+        8; change latent_scale for models whose VAE doesn't. Video latents (batch, channels, frames, height, width)
+        work too, the size is always the last two dimensions.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "latent": ("LATENT", ),
+            },
+            "optional": {
+                "latent_scale": ("INT", {
+                    "default": 8,
+                    "max": 64,
+                    "min": 1,
+                    "step": 1
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT", "INT")
+    RETURN_NAMES = ("input_str", "int_width", "int_height", "batch_size")
+
+    FUNCTION = "get_dimensions"
+
+    CATEGORY = "sizing/input conversions"
+
+    def get_dimensions(self, latent, latent_scale = 8):
+        shape = latent["samples"].shape
+        width, height = shape[-1] * latent_scale, shape[-2] * latent_scale
+        return (f"{width}x{height}", width, height, shape[0])
+
+
+class get_aspect_from_mask:
+    ''' The size of a MASK, read from its shape. Takes a batch (batch, height, width) or a single (height, width)
+        mask.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "mask": ("MASK", ),
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "INT", "INT", "INT")
+    RETURN_NAMES = ("input_str", "int_width", "int_height", "batch_size")
+
+    FUNCTION = "get_dimensions"
+
+    CATEGORY = "sizing/input conversions"
+
+    def get_dimensions(self, mask):
+        shape = mask.shape
+        width, height = shape[-1], shape[-2]
+        return (f"{width}x{height}", width, height, shape[0] if len(shape) > 2 else 1)
+
+
 
 
 
@@ -668,14 +1645,28 @@ NODE_CLASS_MAPPINGS = {
     "sizing_node": sizing_node,
     "sizing_node_basic": sizing_node_basic,
     "sizing_node_unparsed": sizing_node_unparsed,
+    "sizing_node_report": sizing_node_report,
+    "sizing_cost_node": sizing_cost_node,
     "get_aspect_from_ints": get_aspect_from_ints,
-    "get_aspect_from_image": get_aspect_from_image
+    "get_aspect_from_image": get_aspect_from_image,
+    "get_aspect_from_latent": get_aspect_from_latent,
+    "get_aspect_from_mask": get_aspect_from_mask
 
 }
 NODE_DISPLAY_NAME_MAPPINGS = {
     "sizing_node": "sizing for SDXL (advanced)",
     "sizing_node_basic": "sizing for SDXL",
     "sizing_node_unparsed": "sizing for SDXL (int/float inputs)",
+    "sizing_node_report": "sizing for SDXL (with report)",
+    "sizing_cost_node": "sizing cost estimate",
     "get_aspect_from_ints": "width, height -> \'WIDTHxHEIGHT\'",
-    "get_aspect_from_image": "IMAGE -> \'WIDTHxHEIGHT\'"
-}
\ No newline at end of file
+    "get_aspect_from_image": "IMAGE -> \'WIDTHxHEIGHT\'",
+    "get_aspect_from_latent": "LATENT -> \'WIDTHxHEIGHT\'",
+    "get_aspect_from_mask": "MASK -> \'WIDTHxHEIGHT\'"
+}
+
+# SDXL_SIZING_TABLES names precomputed sizing tables to map (see lookup_table.py). They need numpy and the rest of
+# the package, so a single-file install skips them.
+if os.environ.get("SDXL_SIZING_TABLES") and __package__:
+    from .lookup_table import install_from_env
+    install_from_env()
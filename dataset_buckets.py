@@ -0,0 +1,230 @@
+''' Aspect bucketing for training prep: assigns every image in a dataset to its nearest training bucket, with the
+    crop conditioning it gets there, and counts how many images land in each bucket.
+
+    From the folder that holds this one (e.g. ComfyUI/custom_nodes):
+        python -m SDXL_sizing.dataset_buckets images.jsonl -o buckets.jsonl --histogram histogram.json
+        python -m SDXL_sizing.dataset_buckets new_images.jsonl -o buckets.jsonl --histogram histogram.json --update
+
+    The input is JSONL or CSV with an id, a width and a height per image (--id-field and friends pick other field
+    names, e.g. image_scan's path, image_width and image_height). Each output line has the id, the image size, the
+    bucket and the sizing node's outputs for the image as original_res, in input order. Records are streamed, and
+    the histogram only holds a few numbers per bucket, so memory doesn't grow with the dataset.
+
+    --update adds a new batch of images to an earlier run: the assignments are appended to the output and the
+    histogram saved by the earlier run is added to rather than replaced.
+'''
+import argparse
+import csv
+import json
+import os
+import sys
+
+from .conditioning_sizing_for_SDXL import BUCKET_MODE_NAMES, SIZE_FIELDS, bucketing_options, compile_extra_args, get_sizes_numeric
+
+
+ASSIGNMENT_FIELDS = ("id", "image_width", "image_height", "bucket") + SIZE_FIELDS + ("error",)
+
+
+class BucketHistogram:
+    ''' Image counts and totals per bucket. add() takes assignments from assign_buckets; merge() adds another
+        histogram in, and to_dict()/from_dict() (or save()/load()) carry it over to the next run.
+    '''
+    # per bucket: images, images smaller than the bucket (so they get upscaled), summed crop_w and crop_h
+    _FIELDS = ("images", "upscaled", "crop_w", "crop_h")
+
+    def __init__(self):
+        self.buckets = {}
+        self.errors = 0
+
+    def add(self, assignment):
+        if assignment.get("error") is not None:
+            self.errors += 1
+            return
+        key = (assignment["target_width"], assignment["target_height"])
+        stats = self.buckets.get(key)
+        if stats is None:
+            stats = self.buckets[key] = [0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += assignment["image_width"] * assignment["image_height"] < key[0] * key[1]
+        stats[2] += assignment["crop_w"]
+        stats[3] += assignment["crop_h"]
+
+    def merge(self, other):
+        for key, stats in other.buckets.items():
+            mine = self.buckets.setdefault(key, [0, 0, 0, 0])
+            for i, value in enumerate(stats):
+                mine[i] += value
+        self.errors += other.errors
+        return self
+
+    @property
+    def images(self):
+        return sum(stats[0] for stats in self.buckets.values())
+
+    def rows(self):
+        ''' One dict per bucket, by aspect ratio: bucket, target_width, target_height, images, share, upscaled,
+            mean_crop_w and mean_crop_h.
+        '''
+        total = self.images
+        rows = []
+        for (w, h), (images, upscaled, crop_w, crop_h) in sorted(self.buckets.items(), key = lambda item: (item[0][0] / item[0][1], item[0])):
+            rows.append({
+                "bucket": f"{w}x{h}",
+                "target_width": w,
+                "target_height": h,
+                "images": images,
+                "share": images / total if total else 0.0,
+                "upscaled": upscaled,
+                "mean_crop_w": crop_w / images,
+                "mean_crop_h": crop_h / images,
+            })
+        return rows
+
+    def totals(self):
+        return {"images": self.images, "buckets": len(self.buckets), "upscaled": sum(stats[1] for stats in self.buckets.values()), "errors": self.errors}
+
+    def to_dict(self):
+        return {
+            "buckets": [{"bucket": f"{w}x{h}", **dict(zip(self._FIELDS, stats))} for (w, h), stats in self.buckets.items()],
+            "errors": self.errors,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        for entry in data.get("buckets", ()):
+            w, h = (int(v) for v in entry["bucket"].split("x"))
+            histogram.buckets[(w, h)] = [int(entry[name]) for name in cls._FIELDS]
+        histogram.errors = int(data.get("errors", 0))
+        return histogram
+
+    def save(self, path):
+        ''' Saves the counts plus the rows and totals, for reading. from_dict only needs the counts. '''
+        data = self.to_dict()
+        data["rows"] = self.rows()
+        data["totals"] = self.totals()
+        # written next to it and moved into place, so an interrupted run leaves the old histogram intact
+        temp = f"{path}.tmp{os.getpid()}"
+        with open(temp, "w", encoding = "utf-8") as f:
+            json.dump(data, f, indent = 2)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding = "utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def format_table(self):
+        lines = [f"{'bucket':>11} {'images':>10} {'share':>7} {'upscaled':>9} {'crop_w':>7} {'crop_h':>7}"]
+        for row in self.rows():
+            lines.append(f"{row['bucket']:>11} {row['images']:>10} {row['share']:>7.1%} {row['upscaled']:>9} {row['mean_crop_w']:>7.1f} {row['mean_crop_h']:>7.1f}")
+        totals = self.totals()
+        lines.append(f"{'total':>11} {totals['images']:>10} in {totals['buckets']} buckets, {totals['upscaled']} upscaled, {totals['errors']} errors")
+        return "\n".join(lines)
+
+
+def assign_buckets(records, native_res = 1024, strict_bucketing = "SDXL Report", crop_extra = 0.0, fit_aspect_to_bucket = False, extra_args = "", id_field = "id", width_field = "width", height_field = "height"):
+    ''' One assignment dict per record (a mapping with an id, a width and a height), in order. The bucket is the
+        one the sizing node picks for an image of that size, and the sizes are the node's outputs with the image
+        as original_res. A record without a usable size gets an "error" instead.
+
+        The node turns strict bucketing off for aspects beyond 1:4 or 4:1, but every training image needs a bucket,
+        so those go to the widest or tallest one and get cropped to fit.
+    '''
+    options = compile_extra_args(extra_args)
+    clamp = BUCKET_MODE_NAMES.get(strict_bucketing, strict_bucketing) is not False
+    for record in records:
+        assignment = {"id": record.get(id_field)}
+        if record.get("error"):
+            # a line that didn't parse, or a file image_scan couldn't read
+            assignment["error"] = record["error"]
+            yield assignment
+            continue
+        try:
+            width, height = int(record[width_field]), int(record[height_field])
+            if width <= 0 or height <= 0:
+                raise ValueError(f"image size must be positive, got {width}x{height}")
+        except (KeyError, TypeError, ValueError) as e:
+            assignment["error"] = f"{type(e).__name__}: {e}"
+            yield assignment
+            continue
+        aspect = min(max(width / height, 0.25), 4.0) if clamp else width / height
+        sizes = get_sizes_numeric(native_res, aspect, (width, height), crop_extra, 0.0, "disabled", fit_aspect_to_bucket, strict_bucketing, options)
+        assignment["image_width"] = width
+        assignment["image_height"] = height
+        assignment["bucket"] = f"{sizes[4]}x{sizes[5]}"
+        assignment.update(zip(SIZE_FIELDS, sizes))
+        yield assignment
+
+
+def read_records(f, fmt):
+    ''' Input records as dicts, one at a time. '''
+    if fmt == "csv":
+        yield from csv.DictReader(f)
+        return
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield {"error": f"line {number}: {e}"}
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m SDXL_sizing.dataset_buckets", description = "Assign a dataset's images to training buckets and count them.")
+    parser.add_argument("input", nargs = "?", default = "-", help = "JSONL or CSV of images (default: stdin)")
+    parser.add_argument("-o", "--output", default = "-", help = "assignments file (default: stdout)")
+    parser.add_argument("--format", choices = ("jsonl", "csv"), default = None, help = "input and output format (default: from the input file extension, else jsonl)")
+    parser.add_argument("--histogram", metavar = "PATH", help = "save the per-bucket histogram as JSON")
+    parser.add_argument("--update", action = "store_true", help = "append to the output and add to the saved histogram instead of replacing them")
+    parser.add_argument("--id-field", default = "id")
+    parser.add_argument("--width-field", default = "width")
+    parser.add_argument("--height-field", default = "height")
+    parser.add_argument("--native-res", type = int, default = 1024)
+    parser.add_argument("--strict-bucketing", default = "SDXL Report", choices = bucketing_options())
+    parser.add_argument("--crop-extra", type = float, default = 0.0)
+    parser.add_argument("--fit-aspect-to-bucket", action = "store_true")
+    parser.add_argument("--extra-args", default = "", help = "same as the node's extra_args, e.g. \"--nocrop\"")
+    args = parser.parse_args(argv)
+    if args.update and not args.histogram:
+        parser.error("--update needs --histogram")
+
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    histogram = BucketHistogram()
+    if args.update and os.path.exists(args.histogram):
+        histogram = BucketHistogram.load(args.histogram)
+    added = BucketHistogram()
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding = "utf-8", newline = "")
+    appending = args.update and args.output != "-" and os.path.exists(args.output)
+    sink = sys.stdout if args.output == "-" else open(args.output, "a" if appending else "w", encoding = "utf-8", newline = "")
+    try:
+        assignments = assign_buckets(read_records(source, fmt), args.native_res, args.strict_bucketing, args.crop_extra,
+                                     args.fit_aspect_to_bucket, args.extra_args, args.id_field, args.width_field, args.height_field)
+        if fmt == "csv":
+            writer = csv.DictWriter(sink, fieldnames = ASSIGNMENT_FIELDS, extrasaction = "ignore")
+            if not appending:
+                writer.writeheader()
+            write = writer.writerow
+        else:
+            write = lambda assignment: sink.write(json.dumps(assignment) + "\n")
+        for assignment in assignments:
+            write(assignment)
+            added.add(assignment)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    histogram.merge(added)
+    if args.histogram:
+        histogram.save(args.histogram)
+    print(histogram.format_table(), file = sys.stderr)
+    print(f"assigned {added.images} images, {added.errors} errors", file = sys.stderr)
+    return 1 if added.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
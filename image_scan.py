@@ -0,0 +1,198 @@
+''' Reads image dimensions straight from file headers (no decoding, usually only the first few hundred bytes), and
+    sizes whole folders of images with the sizing node's math. This is for img2img and dataset prep, where you
+    have the files rather than an IMAGE tensor.
+
+    From the folder that holds this one (e.g. ComfyUI/custom_nodes):
+        python -m SDXL_sizing.image_scan path/to/images -o sizes.jsonl
+        python -m SDXL_sizing.image_scan path/to/images -o sizes.csv --format csv --workers 8
+
+    Supports PNG, JPEG, WebP, GIF and BMP. Dimensions are as stored, EXIF rotation isn't applied.
+'''
+import argparse
+import csv
+import json
+import os
+import struct
+import sys
+
+from .conditioning_sizing_for_SDXL import SIZE_FIELDS, bucketing_options, compile_extra_args, get_sizes_numeric
+from .parallel import imap_ordered
+
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".jfif", ".webp", ".gif", ".bmp")
+
+RECORD_FIELDS = ("path", "image_width", "image_height") + SIZE_FIELDS + ("error",)
+
+# JPEG start-of-frame markers, which are the ones that hold the dimensions. C4, C8 and CC share the range but
+# are something else.
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise ValueError("truncated image header")
+    return data
+
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = _read_exact(f, 1)
+        if byte != b"\xff":
+            raise ValueError("bad JPEG marker")
+        marker = _read_exact(f, 1)[0]
+        # any number of 0xFF fill bytes can come before a marker
+        while marker == 0xFF:
+            marker = _read_exact(f, 1)[0]
+        if marker == 0xD9 or marker == 0xDA:
+            raise ValueError("no JPEG frame header before the image data")
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            # no length on these
+            continue
+        length = struct.unpack(">H", _read_exact(f, 2))[0]
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack(">xHH", _read_exact(f, 5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        b = head[21:25]
+        width = 1 + (b[0] | (b[1] & 0x3F) << 8)
+        height = 1 + (b[1] >> 6 | b[2] << 2 | (b[3] & 0x0F) << 10)
+        return width, height
+    if chunk == b"VP8X":
+        width = 1 + int.from_bytes(head[24:27], "little")
+        height = 1 + int.from_bytes(head[27:30], "little")
+        return width, height
+    raise ValueError(f"unknown WebP chunk {chunk!r}")
+
+
+def probe_image_size(path):
+    ''' (width, height) of an image file, read from its header without decoding any pixels. Raises ValueError for
+        files it doesn't recognise, and for headers with a zero size (e.g. a truncated GIF or PNG).
+    '''
+    width, height = _header_size(path)
+    if width <= 0 or height <= 0:
+        raise ValueError(f"image header gives an empty size ({width}x{height})")
+    return width, height
+
+
+def _header_size(path):
+    with open(path, "rb") as f:
+        head = f.read(32)
+        if head[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack(">II", head[16:24])
+        if head[:2] == b"\xff\xd8":
+            return _jpeg_size(f)
+        if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+            return _webp_size(head)
+        if head[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", head[6:10])
+        if head[:2] == b"BM":
+            width, height = struct.unpack("<ii", head[18:26])
+            # bottom-up BMPs have a negative height
+            return width, abs(height)
+    raise ValueError("unrecognised image format")
+
+
+def _probe(path):
+    # runs in the worker processes, so errors come back as values rather than killing the scan
+    try:
+        width, height = probe_image_size(path)
+        return path, width, height, None
+    except (OSError, ValueError, struct.error) as e:
+        return path, None, None, str(e) or type(e).__name__
+
+
+def iter_image_paths(paths, recursive = True):
+    ''' Every image file under paths (files are passed through, folders are walked), in a stable order. '''
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        path = os.fspath(path)
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            if not recursive:
+                dirs.clear()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+
+def scan_images(paths, native_res = 1024, crop_extra = 0.0, downscale_effect = 0.0, strict_bucketing = "SDXL Report", fit_aspect_to_bucket = False, extra_args = "", workers = None, chunksize = 256, recursive = True):
+    ''' Probes every image under paths and sizes it, yielding one dict per file as soon as it's ready, in path
+        order. Each image's own dimensions are used as original_res, with the aspect taken from them (aspect -1),
+        and the other inputs are the same as the sizing node's.
+
+        The header reads are spread over a pool of worker processes (workers = 0 to stay in this process). Files
+        that can't be read still get a record, with an "error" and no sizes.
+    '''
+    options = compile_extra_args(extra_args)
+    for path, image_width, image_height, error in imap_ordered(_probe, iter_image_paths(paths, recursive), workers = workers, chunksize = chunksize):
+        record = {"path": path, "image_width": image_width, "image_height": image_height}
+        if error is None:
+            sizes = get_sizes_numeric(native_res, -1, (image_width, image_height), crop_extra, downscale_effect, "disabled", fit_aspect_to_bucket, strict_bucketing, options)
+            record.update(zip(SIZE_FIELDS, sizes))
+        else:
+            record["error"] = error
+        yield record
+
+
+def write_jsonl(records, f):
+    count = 0
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+
+def write_csv(records, f):
+    writer = csv.DictWriter(f, fieldnames = RECORD_FIELDS, extrasaction = "ignore")
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = "Size every image in a folder for SDXL, reading only the file headers.")
+    parser.add_argument("paths", nargs = "+", help = "image files and/or folders")
+    parser.add_argument("-o", "--output", default = "-", help = "output file (default: stdout)")
+    parser.add_argument("--format", choices = ("jsonl", "csv"), default = None, help = "default: from the output file extension, else jsonl")
+    parser.add_argument("--native-res", type = int, default = 1024)
+    parser.add_argument("--crop-extra", type = float, default = 0.0)
+    parser.add_argument("--downscale-effect", type = float, default = 0.0)
+    parser.add_argument("--strict-bucketing", default = "SDXL Report", choices = bucketing_options())
+    parser.add_argument("--fit-aspect-to-bucket", action = "store_true")
+    parser.add_argument("--extra-args", default = "", help = "same as the node's extra_args, e.g. \"--nocrop\"")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes (default: one per CPU, 0 for none)")
+    parser.add_argument("--no-recursive", action = "store_true", help = "don't look in subfolders")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "jsonl")
+    records = scan_images(args.paths, args.native_res, args.crop_extra, args.downscale_effect, args.strict_bucketing,
+                          args.fit_aspect_to_bucket, args.extra_args, workers = args.workers, recursive = not args.no_recursive)
+
+    write = write_csv if fmt == "csv" else write_jsonl
+    if args.output == "-":
+        write(records, sys.stdout)
+    else:
+        with open(args.output, "w", encoding = "utf-8", newline = "") as f:
+            count = write(records, f)
+        print(f"sized {count} images -> {args.output}", file = sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
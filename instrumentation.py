@@ -0,0 +1,230 @@
+''' Opt-in timing for the stages of a sizing call, and a hook for profiling single node runs.
+
+    Nothing here is active until you turn it on. enable() swaps the stage functions of the node module for timed
+    wrappers, and disable() puts the originals back, so when it's off the sizing code runs exactly as it would
+    without this module, at no extra cost.
+
+        from SDXL_sizing import instrumentation
+        instrumentation.enable()
+        ... run some workflows ...
+        print(instrumentation.timings.to_prometheus())
+
+        # profile the next node run with cProfile
+        instrumentation.set_hook(instrumentation.cprofile_hook(), once = True)
+
+    Stages nest: "sizes" is a whole get_sizes_numeric call and includes "normalize", "cache_get", "compute" and
+    so on, and "compute" includes "bucket_lookup" and "report". The times are per stage, not exclusive.
+'''
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+from functools import wraps
+from time import perf_counter
+
+from . import conditioning_sizing_for_SDXL as sizing
+
+
+# stage name -> (what owns the function, attribute name)
+STAGES = {
+    "parse": (sizing.sizing_node, "parse_inputs"),
+    "parse_unparsed": (sizing.sizing_node_unparsed, "parse_inputs_unparsed"),
+    "extra_args": (sizing, "compile_extra_args"),
+    "normalize": (sizing, "sizing_key"),
+    "cache_get": (sizing.sizes_cache, "get"),
+    "cache_put": (sizing.sizes_cache, "put"),
+    "bucket_lookup": (sizing.BucketIndex, "lookup"),
+    "compute": (sizing, "compute_sizes"),
+    "report": (sizing, "log_report"),
+    "sizes": (sizing, "get_sizes_numeric"),
+}
+
+# node class -> the method ComfyUI calls, for set_hook
+NODE_FUNCTIONS = (
+    (sizing.sizing_node, "get_sizes"),
+    (sizing.sizing_node_unparsed, "get_sizes_unparsed"),
+    (sizing.sizing_node_report, "get_sizes_report"),
+)
+
+
+class StageStats:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class TimingRegistry:
+    ''' Call counts and times per stage. Dump it with snapshot(), to_json() or to_prometheus(). It's safe to
+        share between threads.
+    '''
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is None:
+                stats = self._stats[stage] = StageStats()
+            stats.count += 1
+            stats.total += seconds
+            if seconds > stats.max:
+                stats.max = seconds
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self):
+        ''' {stage: {"count", "total_seconds", "mean_seconds", "max_seconds"}} '''
+        with self._lock:
+            return {
+                stage: {
+                    "count": stats.count,
+                    "total_seconds": stats.total,
+                    "mean_seconds": stats.total / stats.count if stats.count else 0.0,
+                    "max_seconds": stats.max,
+                }
+                for stage, stats in self._stats.items()
+            }
+
+    def to_json(self, indent = None):
+        return json.dumps(self.snapshot(), indent = indent)
+
+    def to_prometheus(self, prefix = "sdxl_sizing"):
+        ''' The counters in the Prometheus text exposition format. '''
+        snapshot = self.snapshot()
+        metrics = (
+            ("stage_calls_total", "counter", "Calls per sizing stage.", "count"),
+            ("stage_seconds_total", "counter", "Total seconds spent per sizing stage.", "total_seconds"),
+            ("stage_seconds_max", "gauge", "Slowest single call per sizing stage, in seconds.", "max_seconds"),
+        )
+        lines = []
+        for name, kind, description, field in metrics:
+            lines.append(f"# HELP {prefix}_{name} {description}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for stage, stats in snapshot.items():
+                lines.append(f'{prefix}_{name}{{stage="{stage}"}} {stats[field]!r}')
+        return "\n".join(lines) + "\n"
+
+
+timings = TimingRegistry()
+
+_timed = {}    # stage -> (original function, whether the owner held it itself), while enabled
+_hooked = {}   # (owner, name) -> original function, while a hook is set
+_hook = None
+_hook_once = False
+
+
+def _timed_wrapper(fn, stage, registry):
+    @wraps(fn)
+    def timed(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            registry.record(stage, perf_counter() - start)
+    return timed
+
+
+def enable(stages = None, registry = None):
+    ''' Starts timing the given stages (default: all of STAGES) into registry (default: timings). '''
+    registry = registry or timings
+    for stage in stages or STAGES:
+        if stage in _timed:
+            continue
+        owner, name = STAGES[stage]
+        original = getattr(owner, name)
+        _timed[stage] = (original, name in vars(owner))
+        setattr(owner, name, _timed_wrapper(original, stage, registry))
+
+
+def disable():
+    ''' Stops timing and puts the original functions back. The collected timings are kept. '''
+    for stage, (original, own) in reversed(list(_timed.items())):
+        owner, name = STAGES[stage]
+        if own:
+            setattr(owner, name, original)
+        else:
+            # it came from the owner's class (sizes_cache's methods), so drop the wrapper rather than leave a copy
+            # of the bound method on the instance
+            delattr(owner, name)
+    _timed.clear()
+
+
+def enabled():
+    return bool(_timed)
+
+
+@contextlib.contextmanager
+def instrumented(stages = None, registry = None):
+    ''' Times the stages for the duration of a with block. '''
+    enable(stages, registry)
+    try:
+        yield registry or timings
+    finally:
+        disable()
+
+
+def _hooked_wrapper(fn, node_name):
+    @wraps(fn)
+    def hooked(*args, **kwargs):
+        global _hook, _hook_once
+        hook = _hook
+        if hook is None:
+            return fn(*args, **kwargs)
+        if _hook_once:
+            clear_hook()
+        with hook(node_name):
+            return fn(*args, **kwargs)
+    return hooked
+
+
+def set_hook(hook, once = False):
+    ''' Runs every node invocation inside hook(node_name), which should return a context manager (a tracer, a
+        profiler, a timer...). With once = True the hook is removed after the next invocation.
+    '''
+    global _hook, _hook_once
+    _hook, _hook_once = hook, once
+    for owner, name in NODE_FUNCTIONS:
+        if (owner, name) not in _hooked:
+            # only this class's own method, so subclasses that inherit it aren't wrapped twice
+            original = owner.__dict__[name]
+            _hooked[(owner, name)] = original
+            setattr(owner, name, _hooked_wrapper(original, owner.__name__))
+
+
+def clear_hook():
+    ''' Removes the hook and restores the node methods. '''
+    global _hook, _hook_once
+    _hook, _hook_once = None, False
+    for (owner, name), original in _hooked.items():
+        setattr(owner, name, original)
+    _hooked.clear()
+
+
+def cprofile_hook(sort = "cumulative", limit = 25, stream = None, results = None):
+    ''' A hook for set_hook that runs the node under cProfile and prints the top entries to stream (stderr by
+        default). Pass a list as results to also get the pstats.Stats objects back.
+    '''
+    @contextlib.contextmanager
+    def hook(node_name):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            out = io.StringIO()
+            stats = pstats.Stats(profile, stream = out).sort_stats(sort)
+            stats.print_stats(limit)
+            print(f"---- {node_name} profile\n{out.getvalue()}", file = stream or sys.stderr)
+            if results is not None:
+                results.append(stats)
+    return hook
@@ -0,0 +1,322 @@
+''' Sizing in reverse: start from the final size you want to deliver (say 1920x1080) and find the generation bucket
+    and conditioning that get you there, instead of trying inputs on the sizing node until the numbers work out.
+
+    The delivered image is the generation resized by `scale` so it covers the final size, then centre-cropped to
+    it. Every bucket the active table can give is scored at once with NumPy: the least cropping wins, then the
+    fewest generated pixels. The conditioning is the sizing node's own output for that bucket, with the final
+    size as original_res.
+
+    plan_hires_fix does the same for a base generation followed by upscale passes, choosing the bucket and the
+    pass sizes that generate the fewest pixels in total for the part of the picture that ends up in the final image.
+
+    This needs numpy, like batch_sizing.py.
+'''
+import json
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+from .batch_sizing import _bucket_arrays, make_64
+from .conditioning_sizing_for_SDXL import BUCKET_MODE_NAMES, bucket_table_for, bucketing_options, compile_extra_args, generated_bucket_table, get_sizes_numeric, sizing_node
+
+
+# the node's --sharp flags and the multiplier each one gives the width/height conditioning
+SHARP_FLAGS = {1.0: "", 1.33: "--sharp", 1.67: "--extrasharp", 2.0: "--supersharp"}
+
+
+class FinalSizeSolution(NamedTuple):
+    target_width: int
+    target_height: int
+    scale: float            # resize the generation by this (above 1.0 is an upscale) ...
+    final_crop_w: int       # ... then cut this many pixels off the width in total
+    final_crop_h: int       # ... and this many off the height
+    crop_fraction: float    # share of the resized generation that gets cropped away
+    sharp: float            # width/height conditioning multiplier (1.0 for none)
+    extra_args: str         # the sharp flag for the sizing node, if any
+    sizes: tuple            # the sizing node's seven outputs for this bucket, with the final size as original_res
+
+
+def _active_table(native_res, strict_bucketing):
+    mode = BUCKET_MODE_NAMES.get(strict_bucketing, strict_bucketing)
+    # with bucketing off there's no table, so search the buckets generated for native_res
+    table = bucket_table_for(mode, native_res) if mode else generated_bucket_table(native_res)
+    if table is None:
+        raise ValueError(f"solve_final_size: no buckets at native_res {native_res}")
+    return mode, table
+
+
+def _candidates(native_res, strict_bucketing):
+    # the generation sizes to choose from: (mode, aspect_w, aspect_h, widths, heights), where aspect_w/aspect_h is
+    # what to give the sizing node as the aspect to land on widths/heights
+    mode, table = _active_table(native_res, strict_bucketing)
+    # only the buckets a lookup can actually return (one per aspect ratio), so the forward pass lands on them too
+    _, aspect_w, aspect_h = _bucket_arrays(table, native_res**2)
+    if mode:
+        return mode, aspect_w, aspect_h, aspect_w, aspect_h
+    # with bucketing off, the node rounds each aspect to 64-multiples itself
+    aspect = aspect_w / aspect_h
+    c = np.power(native_res**2 / aspect, 1/2)
+    return mode, aspect_w, aspect_h, make_64(c * aspect), make_64(c)
+
+
+def _pick_sharp(scale, sharp_options):
+    # the smallest multiplier that keeps the width/height conditioning at least as big as the generation (so the
+    # model isn't told it's making an upscaled small image), or the biggest one there is
+    options = sorted(sharp_options)
+    for sharp in options:
+        if sharp * scale >= 1.0:
+            return sharp
+    return options[-1]
+
+
+def solve_final_size(final_width, final_height, native_res = 1024, strict_bucketing = "SDXL Report", sharp_options = (1.0,), top = 1):
+    ''' The best ways to deliver a final_width x final_height image, best first (top of them).
+
+        strict_bucketing picks the table to search, as on the sizing node ("disabled" searches the buckets
+        generated for native_res). sharp_options are the width/height conditioning multipliers to choose from,
+        from SHARP_FLAGS, e.g. tuple(SHARP_FLAGS) to allow all of them.
+    '''
+    if final_width <= 0 or final_height <= 0:
+        raise ValueError("solve_final_size: the final size must be positive")
+    unknown = set(sharp_options) - set(SHARP_FLAGS)
+    if unknown:
+        raise ValueError(f"solve_final_size: sharp options must be from {tuple(SHARP_FLAGS)}, got {sorted(unknown)}")
+
+    mode, aspect_w, aspect_h, widths, heights = _candidates(native_res, strict_bucketing)
+    scale = np.maximum(final_width / widths, final_height / heights)
+    covered_w = scale * widths
+    covered_h = scale * heights
+    crop_fraction = 1.0 - (final_width * final_height) / (covered_w * covered_h)
+    # least cropping, then fewest pixels to generate. The rounding keeps float noise from splitting exact ties.
+    order = np.lexsort((widths * heights, np.round(crop_fraction, 12)))
+
+    solutions = []
+    for i in order[:top]:
+        target_width, target_height, s = int(widths[i]), int(heights[i]), float(scale[i])
+        sharp = _pick_sharp(s, sharp_options)
+        extra_args = SHARP_FLAGS[sharp]
+        sizes = get_sizes_numeric(native_res, (int(aspect_w[i]), int(aspect_h[i])), (final_width, final_height), 0.0, 1.0,
+                                  "disabled", False, mode or "disabled", compile_extra_args(extra_args))
+        solutions.append(FinalSizeSolution(
+            target_width, target_height, s,
+            int(round(covered_w[i])) - final_width, int(round(covered_h[i])) - final_height,
+            float(crop_fraction[i]), sharp, extra_args, sizes,
+        ))
+    return solutions
+
+
+class HiresStage(NamedTuple):
+    width: int              # the sizing node's outputs for this pass, with the final size as original_res
+    height: int
+    crop_w: int
+    crop_h: int
+    target_width: int       # the size this pass generates at
+    target_height: int
+    downscale: float        # on the last pass, the resize down to the final size (before centre-cropping)
+    upscale: float          # how much bigger this pass is than the one before (1.0 for the base generation)
+
+
+class HiresPlan(NamedTuple):
+    stages: tuple           # HiresStage for the base generation, then one per upscale pass
+    total_pixels: int       # generated pixels over all the passes
+    final_crop_w: int       # what to cut off the last pass, in total, after resizing it by its downscale
+    final_crop_h: int
+    crop_fraction: float    # share of the last pass that gets cropped away
+    composition_crop: float # share of the base generation's picture that's outside the final aspect ratio
+
+    def as_dict(self):
+        d = self._asdict()
+        d["stages"] = [stage._asdict() for stage in self.stages]
+        return d
+
+    def to_json(self, indent = None):
+        return json.dumps(self.as_dict(), indent = indent)
+
+
+def _ceil_64(x):
+    # up to a multiple of 64, ignoring float noise just above one
+    return int(math.ceil(x / 64 - 1e-9)) * 64
+
+
+def _upscale_chain(base_w, base_h, final_width, final_height, max_upscale, max_stages):
+    # the pass sizes after the base, smallest first. The last one covers the final size, and each one before it is
+    # the smallest 64-multiple that the next can be reached from, so no pass is bigger than it has to be.
+    scale = max(final_width / base_w, final_height / base_h)
+    if scale <= 1.0:
+        return []
+    chain = [(_ceil_64(base_w * scale), _ceil_64(base_h * scale))]
+    while chain[-1][0] > base_w * max_upscale + 1e-9 or chain[-1][1] > base_h * max_upscale + 1e-9:
+        if len(chain) >= max_stages:
+            return None
+        w, h = chain[-1]
+        chain.append((max(base_w, _ceil_64(w / max_upscale)), max(base_h, _ceil_64(h / max_upscale))))
+    return chain[::-1]
+
+
+def plan_hires_fix(final_width, final_height, max_upscale = 2.0, native_res = 1024, strict_bucketing = "SDXL Report", max_stages = 4, top = 1):
+    ''' Plans a base generation plus upscale passes (hires fix, refiner passes) to deliver a final_width x
+        final_height image while generating as few pixels in total as possible, best first (top of them).
+
+        The base is a bucket from the active table, as on the sizing node. Each pass after it is at most
+        max_upscale times the one before on either side, in 64-multiples, and the last one covers the final
+        size. Every base bucket is tried, with as few passes as it needs. Bases that need more than max_stages
+        upscale passes are left out.
+
+        Plans are ranked by the pixels they generate per pixel of the picture that's kept: the total is divided
+        by 1 - composition_crop, the share of the base that falls outside the final aspect ratio. So a bucket
+        whose shape would crop a lot of the composition away loses to one that fits, even if it's a bit smaller
+        (1344x768 rather than 1280x768 for 1920x1080, and 1024x1024 rather than 704x1344 for a square).
+    '''
+    if final_width <= 0 or final_height <= 0:
+        raise ValueError("plan_hires_fix: the final size must be positive")
+    if max_upscale <= 1.0:
+        raise ValueError("plan_hires_fix: max_upscale must be more than 1.0")
+
+    mode, aspect_w, aspect_h, widths, heights = _candidates(native_res, strict_bucketing)
+    options = compile_extra_args("")
+    final_aspect = final_width / final_height
+
+    ranked = []
+    for i in range(len(widths)):
+        base_w, base_h = int(widths[i]), int(heights[i])
+        chain = _upscale_chain(base_w, base_h, final_width, final_height, max_upscale, max_stages)
+        if chain is None:
+            continue
+        last_w, last_h = chain[-1] if chain else (base_w, base_h)
+        resize = max(final_width / last_w, final_height / last_h)
+        crop_fraction = 1.0 - (final_width * final_height) / (last_w * last_h * resize * resize)
+        total = base_w * base_h + sum(w * h for w, h in chain)
+        composition_crop = 1.0 - min(base_w / base_h / final_aspect, final_aspect * base_h / base_w)
+        # fewest pixels per kept pixel of the composition, then fewest passes, then least cropping
+        ranked.append((round(total / (1.0 - composition_crop), 6), len(chain), round(crop_fraction, 12), i, total, composition_crop, chain))
+    if not ranked:
+        raise ValueError(f"plan_hires_fix: {final_width}x{final_height} needs more than {max_stages} upscale passes of {max_upscale}x")
+    ranked.sort(key = lambda r: r[:4])
+
+    plans = []
+    for _, _, crop_fraction, i, total, composition_crop, chain in ranked[:top]:
+        base_w, base_h = int(widths[i]), int(heights[i])
+        sizes = get_sizes_numeric(native_res, (int(aspect_w[i]), int(aspect_h[i])), (final_width, final_height), 0.0, 1.0,
+                                  "disabled", False, mode or "disabled", options)
+        stages = [HiresStage(*sizes, 1.0)]
+        previous = (base_w, base_h)
+        for w, h in chain:
+            # with bucketing off, native_res and aspect from the pass's own size make the node land exactly on it
+            sizes = get_sizes_numeric((w * h) ** (1/2), (w, h), (final_width, final_height), 0.0, 1.0,
+                                      "disabled", False, "disabled", options)
+            stages.append(HiresStage(*sizes, max(w / previous[0], h / previous[1])))
+            previous = (w, h)
+        last_w, last_h = previous
+        resize = max(final_width / last_w, final_height / last_h)
+        plans.append(HiresPlan(
+            tuple(stages), total,
+            int(round(last_w * resize)) - final_width, int(round(last_h * resize)) - final_height,
+            crop_fraction, composition_crop,
+        ))
+    return plans
+
+
+class final_size_node:
+    ''' Works backwards from the size you want to end up with. Outputs the conditioning for the best generation
+        bucket (least cropping, then fewest pixels), and the scale to resize the generation by before
+        centre-cropping it to the final size. allow_sharp lets it pick a --sharp multiplier so the width/height
+        conditioning isn't smaller than the generation.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "final_width": ("INT", {
+                    "min": 64,
+                    "max": 16384,
+                    "default": 1920,
+                    "step": 1
+                }),
+                "final_height": ("INT", {
+                    "min": 64,
+                    "max": 16384,
+                    "default": 1080,
+                    "step": 1
+                }),
+                "native_res": ("STRING", {
+                    "multiline": False,
+                    "default": "1024"
+                }),
+            },
+            "optional": {
+                "strict_bucketing": (bucketing_options(),),
+                "allow_sharp": (["disabled", "enabled"],),
+            }
+        }
+
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "INT", "INT", "FLOAT")
+    RETURN_NAMES = ("width", "height", "crop_w", "crop_h", "target_width", "target_height", "scale")
+
+    FUNCTION = "solve"
+
+    CATEGORY = "sizing"
+
+    def solve(self, final_width, final_height, native_res = "1024", strict_bucketing = "SDXL Report", allow_sharp = "disabled"):
+        native_res, _, _ = sizing_node().parse_inputs(native_res, "1", "1")
+        sharp_options = tuple(SHARP_FLAGS) if allow_sharp == "enabled" else (1.0,)
+        best = solve_final_size(final_width, final_height, native_res, strict_bucketing, sharp_options)[0]
+        width, height, crop_w, crop_h, target_width, target_height, _ = best.sizes
+        return (width, height, crop_w, crop_h, target_width, target_height, best.scale)
+
+
+class hires_plan_node:
+    ''' Plans a hires fix: the base generation and the upscale passes that deliver the final size while generating
+        the fewest pixels for the composition kept, with no pass more than max_upscale times the one before. Outputs the conditioning for
+        the base generation, and the whole plan (every pass's conditioning and size) as JSON.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "final_width": ("INT", {
+                    "min": 64,
+                    "max": 16384,
+                    "default": 3840,
+                    "step": 1
+                }),
+                "final_height": ("INT", {
+                    "min": 64,
+                    "max": 16384,
+                    "default": 2160,
+                    "step": 1
+                }),
+                "max_upscale": ("FLOAT", {
+                    "min": 1.05,
+                    "max": 8.0,
+                    "default": 2.0,
+                    "step": 0.05
+                }),
+                "native_res": ("STRING", {
+                    "multiline": False,
+                    "default": "1024"
+                }),
+            },
+            "optional": {
+                "strict_bucketing": (bucketing_options(),),
+                "max_stages": ("INT", {
+                    "min": 1,
+                    "max": 16,
+                    "default": 4,
+                    "step": 1
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "INT", "INT", "INT", "STRING")
+    RETURN_NAMES = ("width", "height", "crop_w", "crop_h", "target_width", "target_height", "upscale_passes", "plan")
+
+    FUNCTION = "plan"
+
+    CATEGORY = "sizing"
+
+    def plan(self, final_width, final_height, max_upscale, native_res = "1024", strict_bucketing = "SDXL Report", max_stages = 4):
+        native_res, _, _ = sizing_node().parse_inputs(native_res, "1", "1")
+        best = plan_hires_fix(final_width, final_height, max_upscale, native_res, strict_bucketing, max_stages)[0]
+        base = best.stages[0]
+        return (base.width, base.height, base.crop_w, base.crop_h, base.target_width, base.target_height, len(best.stages) - 1, best.to_json())
@@ -0,0 +1,245 @@
+''' Precomputed sizing tables. For W:H aspects and int original_res (the long side), the sizing node's outputs only
+    depend on the bucket mode and a few shared settings, so they can be worked out once over a grid and written to
+    a file. Mapping that file makes a lookup an index calculation and one record read, and every process that maps
+    it shares the same pages through the page cache.
+
+    From the folder that holds this one (e.g. ComfyUI/custom_nodes):
+        python -m SDXL_sizing.lookup_table build sizes.lut --numerators 1:32 --denominators 1:32 --original-res 512:4096:64
+        python -m SDXL_sizing.lookup_table info sizes.lut
+
+    Set SDXL_SIZING_TABLES to the file (or several, separated like PATH) and the nodes, the command line sizer
+    and the sizing service all look there first. Anything the table doesn't cover goes through the usual math,
+    and so does verbose reporting. The file records the buckets it was built with, and a table whose buckets no
+    longer match the registered ones is refused (or dropped, when register_bucket_table replaces one while it's in
+    use), so rebuild it after changing a bucket table.
+
+    The file is an 8 byte magic, a little-endian uint32 header length, a JSON header, padding to a multiple of 64
+    bytes, and then fixed-width RECORD_DTYPE records in C order over (mode, numerator, denominator, original_res).
+    This needs numpy.
+'''
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from .batch_sizing import get_sizes_batch
+from .conditioning_sizing_for_SDXL import BUCKET_MODE_NAMES, bucket_table_for, bucketing_options, compile_extra_args, precomputed_tables, sizing_node
+
+
+MAGIC = b"SDXLLUT1"
+ALIGN = 64
+
+RECORD_DTYPE = np.dtype([
+    ("width", "<i4"),
+    ("height", "<i4"),
+    ("crop_w", "<i4"),
+    ("crop_h", "<i4"),
+    ("target_width", "<u2"),
+    ("target_height", "<u2"),
+    ("downscale", "<f8"),
+])
+# the same record for struct, which reads one faster than indexing the array does
+RECORD_STRUCT = struct.Struct("<iiiiHHd")
+
+_node = sizing_node()
+
+
+def _buckets_fingerprint(modes, native_res):
+    # what the table's results depend on besides the inputs: the buckets each mode uses at native_res
+    tables = []
+    for mode in modes:
+        bucket_mode = BUCKET_MODE_NAMES.get(mode, mode)
+        table = bucket_table_for(bucket_mode, native_res) if bucket_mode else None
+        tables.append((mode, table.buckets if table is not None else None))
+    return hashlib.sha256(repr(tables).encode("utf-8")).hexdigest()
+
+
+def _fit(value):
+    return value is True or value == "enabled"
+
+
+def build_table(path, numerators = (1, 32), denominators = (1, 32), original_res = (512, 4096, 64), modes = ("SDXL Report",), native_res = 1024,
+                crop_extra = 0.0, downscale_effect = 0.0, fit_aspect_to_bucket = "disabled", extra_args = ""):
+    ''' Works out the sizing node's outputs for every aspect numerator:denominator in the inclusive numerators and
+        denominators ranges, every original_res in the inclusive (start, stop, step) range and every mode, with
+        the other inputs as given, and writes them to path. Returns the number of records.
+    '''
+    modes = tuple(modes)
+    for mode in modes:
+        if mode not in bucketing_options():
+            raise ValueError(f"build_table: unknown strict_bucketing '{mode}', expected one of {bucketing_options()}")
+    if compile_extra_args(extra_args).randomaspect is not None:
+        raise ValueError("build_table: --randomaspect results can't be precomputed")
+    n0, n1 = numerators
+    d0, d1 = denominators
+    o0, o1, step = original_res
+    if not (0 < n0 <= n1 and 0 < d0 <= d1 and 0 < o0 <= o1 and step > 0):
+        raise ValueError("build_table: the grid ranges must be positive and in order")
+
+    nums = np.arange(n0, n1 + 1, dtype = np.int64)
+    dens = np.arange(d0, d1 + 1, dtype = np.int64)
+    origs = np.arange(o0, o1 + 1, step, dtype = np.int64)
+    # every (numerator, denominator, original_res), in the same C order as the records
+    grid_n, grid_d, grid_o = (a.ravel() for a in np.meshgrid(nums, dens, origs, indexing = "ij"))
+    aspect = np.stack((grid_n, grid_d), axis = 1)
+
+    records = np.empty((len(modes), len(nums), len(dens), len(origs)), dtype = RECORD_DTYPE)
+    for m, mode in enumerate(modes):
+        out = get_sizes_batch(aspect, grid_o, crop_extra, downscale_effect, native_res, mode, "enabled" if _fit(fit_aspect_to_bucket) else "disabled", extra_args)
+        if out["target_width"].max() > 0xffff or out["target_height"].max() > 0xffff:
+            raise ValueError("build_table: a target size is too big for the table's record format")
+        flat = records[m].reshape(-1)
+        for name in RECORD_DTYPE.names:
+            flat[name] = out[name]
+
+    header = json.dumps({
+        "native_res": native_res,
+        "modes": modes,
+        "crop_extra": float(crop_extra),
+        "downscale_effect": float(downscale_effect),
+        "fit_aspect_to_bucket": _fit(fit_aspect_to_bucket),
+        "extra_args": extra_args,
+        "numerators": [n0, n1],
+        "denominators": [d0, d1],
+        "original_res": [int(origs[0]), int(origs[-1]), step],
+        "shape": list(records.shape),
+        "buckets": _buckets_fingerprint(modes, native_res),
+    }).encode("utf-8")
+    start = -(-(len(MAGIC) + 4 + len(header)) // ALIGN) * ALIGN
+
+    # written next to the target and moved into place, so processes mapping the old file never see half of it
+    temp = f"{path}.tmp{os.getpid()}"
+    with open(temp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(b"\0" * (start - f.tell()))
+        f.write(records.tobytes())
+    os.replace(temp, path)
+    return records.size
+
+
+class SizingLookupTable:
+    ''' A table file from build_table, memory-mapped. get() takes get_sizes_numeric's inputs and gives the seven
+        outputs, or None when the inputs are off the grid or the shared settings don't match the table's.
+    '''
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"SizingLookupTable: {path} isn't a sizing table")
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length).decode("utf-8"))
+        start = -(-(len(MAGIC) + 4 + length) // ALIGN) * ALIGN
+
+        self.path = path
+        self.header = header
+        self.native_res = header["native_res"]
+        if not self.buckets_match():
+            raise ValueError(f"SizingLookupTable: {path} was built with different buckets than are registered now, rebuild it")
+        self.crop_extra = header["crop_extra"]
+        self.downscale_effect = header["downscale_effect"]
+        self.fit_aspect_to_bucket = header["fit_aspect_to_bucket"]
+        self.options = compile_extra_args(header["extra_args"])
+        self.extra_args = header["extra_args"]
+        self.modes = {BUCKET_MODE_NAMES.get(mode, mode): i for i, mode in enumerate(header["modes"])}
+        self.n0, self.n1 = header["numerators"]
+        self.d0, self.d1 = header["denominators"]
+        self.o0, self.o1, self.step = header["original_res"]
+        shape = tuple(header["shape"])
+        self._strides = (shape[1] * shape[2] * shape[3], shape[2] * shape[3], shape[3])
+        self._start = start
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.records = np.frombuffer(self._map, dtype = RECORD_DTYPE, count = int(np.prod(shape)), offset = start).reshape(shape)
+
+    def __len__(self):
+        return self.records.size
+
+    def buckets_match(self):
+        ''' Whether the registered buckets are still the ones the table was built with. register_bucket_table
+            checks this when it replaces a table, and stops using the ones that no longer match.
+        '''
+        return _buckets_fingerprint(self.header["modes"], self.native_res) == self.header["buckets"]
+
+    def __repr__(self):
+        return f"SizingLookupTable({self.path!r}, {len(self)} records)"
+
+    def get(self, native_res, aspect, original_res, crop_extra = 0.0, downscale_effect = 0.0, fit_aspect_to_bucket = False, strict_bucketing = "SDXL Report", extra_args = ""):
+        if type(aspect) is not tuple or type(original_res) is not int:
+            return None
+        if native_res != self.native_res or crop_extra != self.crop_extra or downscale_effect != self.downscale_effect:
+            return None
+        if _fit(fit_aspect_to_bucket) != self.fit_aspect_to_bucket:
+            return None
+        if extra_args != self.extra_args and (compile_extra_args(extra_args) if isinstance(extra_args, str) else extra_args) != self.options:
+            return None
+        mode = self.modes.get(BUCKET_MODE_NAMES.get(strict_bucketing, strict_bucketing))
+        if mode is None:
+            return None
+        n, d = aspect
+        k, off_grid = divmod(original_res - self.o0, self.step)
+        if off_grid or not (self.n0 <= n <= self.n1 and self.d0 <= d <= self.d1 and self.o0 <= original_res <= self.o1):
+            return None
+        sm, sn, sd = self._strides
+        return RECORD_STRUCT.unpack_from(self._map, self._start + RECORD_DTYPE.itemsize * (mode * sm + (n - self.n0) * sn + (d - self.d0) * sd + k))
+
+
+def install(path):
+    ''' Maps a table file and puts it in front of the sizing math. Returns the SizingLookupTable. '''
+    table = SizingLookupTable(path)
+    precomputed_tables.append(table)
+    return table
+
+
+def install_from_env(variable = "SDXL_SIZING_TABLES"):
+    ''' install() every file named in the environment variable (separated like PATH). A table that can't be used
+        is reported and skipped, so a stale file doesn't break the nodes.
+    '''
+    installed = []
+    for path in filter(None, os.environ.get(variable, "").split(os.pathsep)):
+        try:
+            installed.append(install(path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"sizing_node: couldn't use sizing table {path}: {e}", file = sys.stderr)
+    return installed
+
+
+def _range(text):
+    return tuple(int(part) for part in text.split(":"))
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m SDXL_sizing.lookup_table", description = "Build or inspect precomputed sizing tables.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    build = commands.add_parser("build", help = "precompute a table")
+    build.add_argument("path")
+    build.add_argument("--numerators", type = _range, default = (1, 32), help = "aspect numerators, start:stop (default 1:32)")
+    build.add_argument("--denominators", type = _range, default = (1, 32), help = "aspect denominators, start:stop (default 1:32)")
+    build.add_argument("--original-res", type = _range, default = (512, 4096, 64), help = "original_res values, start:stop:step (default 512:4096:64)")
+    build.add_argument("--modes", nargs = "+", default = ["SDXL Report"], help = "strict_bucketing values (default: SDXL Report)")
+    build.add_argument("--native-res", type = int, default = 1024)
+    build.add_argument("--crop-extra", type = float, default = 0.0)
+    build.add_argument("--downscale-effect", type = float, default = 0.0)
+    build.add_argument("--fit-aspect-to-bucket", action = "store_true")
+    build.add_argument("--extra-args", default = "")
+
+    info = commands.add_parser("info", help = "show a table's header")
+    info.add_argument("path")
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        count = build_table(args.path, args.numerators, args.denominators, args.original_res, args.modes, args.native_res,
+                            args.crop_extra, args.downscale_effect, args.fit_aspect_to_bucket, args.extra_args)
+        print(f"wrote {count} records ({os.path.getsize(args.path)} bytes) to {args.path}", file = sys.stderr)
+    else:
+        table = SizingLookupTable(args.path)
+        print(json.dumps(dict(table.header, records = len(table)), indent = 2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
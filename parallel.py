@@ -0,0 +1,47 @@
+''' A small helper for fanning work out over a process pool without reading the whole input up front. Used by the
+    bulk tools (like the image scanner) so they can stream through inputs of any size.
+'''
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+
+def _run_chunk(fn, chunk):
+    return [fn(i) for i in chunk]
+
+
+def imap_ordered(fn, iterable, workers = None, chunksize = 256, max_pending = None):
+    ''' Like map(fn, iterable), but the calls run in a pool of worker processes, chunksize items at a time. Results
+        come back in input order. At most max_pending chunks (default: twice the number of workers) are in flight
+        at once, so memory stays bounded however long the input is.
+
+        workers = 0 runs everything in this process, which is handy for small inputs and for debugging. fn has to
+        be picklable (a module level function) when workers isn't 0.
+    '''
+    iterator = iter(iterable)
+
+    if workers == 0:
+        for item in iterator:
+            yield fn(item)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        pending = deque()
+
+        def submit():
+            chunk = list(islice(iterator, chunksize))
+            if chunk:
+                pending.append(pool.submit(_run_chunk, fn, chunk))
+            return bool(chunk)
+
+        while len(pending) < max_pending and submit():
+            pass
+
+        while pending:
+            results = pending.popleft().result()
+            submit()
+            yield from results
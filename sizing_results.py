@@ -0,0 +1,123 @@
+''' A compact container for lots of sizing results. Holding millions of seven-tuples of Python ints and floats takes
+    a few hundred bytes a row; SizingColumns keeps each output in its own contiguous typed array (six int32 columns
+    and a float64 one, 32 bytes a row) and only builds a tuple when you ask for a row.
+
+        results = SizingColumns()
+        for request in requests:
+            results.append(node.get_sizes(**request))
+        results = SizingColumns.from_batch(get_sizes_batch(aspect, original_res))   # or straight from the batch sizer
+
+        results[5]                      # (width, height, crop_w, crop_h, target_width, target_height, downscale)
+        results["target_width"]         # a memoryview of the column, no copy
+        results.to_numpy()              # {name: ndarray} sharing the columns' memory
+        results.to_arrow()              # a pyarrow.Table over the same memory
+
+    The columns use the standard array module, so this works without numpy. The exports are views of the columns,
+    and Python won't let an array grow while a view of it is alive, so append after you're done with them (or
+    copy them). Columns are in the machine's byte order, which is little-endian (and so Arrow's) on anything
+    ComfyUI runs on.
+'''
+import operator
+from array import array
+
+
+FIELDS = ("width", "height", "crop_w", "crop_h", "target_width", "target_height", "downscale")
+# the array typecode that's 4 bytes on this platform ("i" nearly everywhere)
+INT32 = next(code for code in "ilh" if array(code).itemsize == 4)
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+TYPECODES = (INT32,) * 6 + ("d",)
+NUMPY_DTYPES = ("i4",) * 6 + ("f8",)
+
+
+class SizingColumns:
+    ''' Sizing results stored column by column. Indexing with an int gives a row tuple, with a slice a new
+        SizingColumns, and with a field name that column as a memoryview. Iterating builds one tuple at a time.
+    '''
+    __slots__ = ("_columns",)
+
+    def __init__(self, rows = ()):
+        self._columns = tuple(array(code) for code in TYPECODES)
+        self.extend(rows)
+
+    @classmethod
+    def _wrap(cls, columns):
+        out = cls.__new__(cls)
+        out._columns = columns
+        return out
+
+    @classmethod
+    def from_batch(cls, sizes):
+        ''' From a batch_sizing.get_sizes_batch structured array (or anything with the seven fields by name). '''
+        import numpy as np
+        columns = []
+        for name, code, dtype in zip(FIELDS, TYPECODES, NUMPY_DTYPES):
+            column = array(code)
+            column.frombytes(np.ascontiguousarray(sizes[name], dtype = dtype).tobytes())
+            columns.append(column)
+        return cls._wrap(tuple(columns))
+
+    def append(self, sizes):
+        ''' Adds one row, e.g. a sizing node's seven outputs. '''
+        if len(sizes) != len(FIELDS):
+            raise ValueError(f"SizingColumns: expected {len(FIELDS)} values, got {len(sizes)}")
+        # everything is converted and checked before anything is written, so a bad value can't leave the columns
+        # at different lengths
+        row = [operator.index(value) for value in sizes[:6]]
+        for value in row:
+            if not INT32_MIN <= value <= INT32_MAX:
+                raise OverflowError(f"SizingColumns: {value} doesn't fit in an int32 column")
+        row.append(float(sizes[6]))
+        for column, value in zip(self._columns, row):
+            column.append(value)
+
+    def extend(self, rows):
+        for sizes in rows:
+            self.append(sizes)
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return self.column(index)
+        if isinstance(index, slice):
+            return self._wrap(tuple(column[index] for column in self._columns))
+        return tuple(column[index] for column in self._columns)
+
+    def __iter__(self):
+        return zip(*self._columns)
+
+    def __repr__(self):
+        return f"SizingColumns({len(self)} rows)"
+
+    @property
+    def nbytes(self):
+        return sum(column.itemsize * len(column) for column in self._columns)
+
+    def column(self, name):
+        ''' One output as a read-only memoryview over the column (the buffer protocol, no copy). '''
+        try:
+            return memoryview(self._columns[FIELDS.index(name)]).toreadonly()
+        except ValueError:
+            raise KeyError(f"SizingColumns: no column '{name}', expected one of {FIELDS}") from None
+
+    def to_numpy(self):
+        ''' {field: read-only ndarray} sharing the columns' memory. '''
+        import numpy as np
+        return {name: np.frombuffer(memoryview(column).toreadonly(), dtype = dtype) for name, column, dtype in zip(FIELDS, self._columns, NUMPY_DTYPES)}
+
+    def to_structured(self):
+        ''' A copy in the batch sizer's structured array layout (batch_sizing.SIZES_DTYPE), one record per row. '''
+        import numpy as np
+        from .batch_sizing import SIZES_DTYPE
+        out = np.empty(len(self), dtype = SIZES_DTYPE)
+        for name, column in self.to_numpy().items():
+            out[name] = column
+        return out
+
+    def to_arrow(self):
+        ''' A pyarrow.Table with one column per output, over the columns' memory (needs pyarrow). '''
+        import pyarrow as pa
+        types = (pa.int32(),) * 6 + (pa.float64(),)
+        arrays = [pa.Array.from_buffers(kind, len(column), [None, pa.py_buffer(column)]) for kind, column in zip(types, self._columns)]
+        return pa.Table.from_arrays(arrays, names = list(FIELDS))
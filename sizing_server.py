@@ -0,0 +1,416 @@
+''' A small long-lived sizing service, so tools outside ComfyUI (prompt routers, dataset scripts, UI previews) can
+    get the sizing node's numbers without re-implementing them or starting Python every time.
+
+    From the folder that holds this one (e.g. ComfyUI/custom_nodes):
+        python -m SDXL_sizing.sizing_server serve --unix /tmp/sdxl_sizing.sock
+        python -m SDXL_sizing.sizing_server serve --port 8765
+        python -m SDXL_sizing.sizing_server loadgen --unix /tmp/sdxl_sizing.sock --clients 16 --requests 20000
+
+    The protocol is newline-delimited JSON. Each request line has any of the advanced node's inputs (native_res,
+    aspect, original_res, crop_extra, downscale_effect, fit_aspect_to_bucket, strict_bucketing, extra_args, seed)
+    as the node's strings or plain numbers, plus an optional "id". Each reply line has the "id" and the seven
+    outputs, or an "error". Replies on a connection come back in the order the requests were sent, so requests
+    can be pipelined. {"op": "stats"} returns the server's counters instead.
+
+    Requests that arrive within max_delay of each other are coalesced: repeats are answered once, and requests
+    that share their settings are sized together with batch_sizing.get_sizes_batch. Results are kept in a warm
+    cache. Without numpy everything goes through the scalar code instead.
+'''
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+
+from .conditioning_sizing_for_SDXL import REQUEST_DEFAULTS, REQUEST_FIELDS, SIZE_FIELDS, SizingCache, as_node_string, compile_extra_args, get_sizes_numeric, sizing_node
+
+try:
+    import numpy as np
+    from .batch_sizing import KIND_DTYPES, get_sizes_batch, input_kind
+except ImportError:
+    np = None
+    get_sizes_batch = None
+
+
+def _percentiles(samples, quantiles = (0.5, 0.9, 0.99)):
+    samples = sorted(samples)
+    if not samples:
+        return {f"p{int(q * 100)}_ms": 0.0 for q in quantiles}
+    return {f"p{int(q * 100)}_ms": samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 for q in quantiles}
+
+
+class SizingServer:
+    ''' The sizing service. Use size() directly from asyncio code, or serve_unix()/serve_tcp() for other processes.
+
+        max_batch - a batch goes out as soon as this many requests are waiting, without waiting for max_delay.
+        max_delay - seconds to wait for more requests to coalesce with the first one.
+        min_vector - groups smaller than this use the scalar code, which is quicker for a handful of requests.
+        cache_size - results kept in the warm cache.
+        defaults - inputs used when a request leaves them out.
+    '''
+    def __init__(self, max_batch = 512, max_delay = 0.002, min_vector = 16, cache_size = 65536, defaults = None):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.min_vector = min_vector
+        self.defaults = dict(REQUEST_DEFAULTS)
+        self.defaults.update(defaults or {})
+        self.cache = SizingCache(cache_size)
+        self._node = sizing_node()
+        self._pending = {}           # key -> list of futures
+        self._pending_count = 0
+        self._wakeup = None
+        self._full = None
+        self._batcher_task = None
+
+        self.started = time.monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.vectorized = 0
+        self.coalesced = 0
+        self._latencies = deque(maxlen = 10000)    # (finished at, seconds)
+
+    def _start(self):
+        if self._batcher_task is None:
+            self._wakeup = asyncio.Event()
+            self._full = asyncio.Event()
+            self._batcher_task = asyncio.get_running_loop().create_task(self._batcher())
+
+    def normalize(self, request):
+        ''' A request dict as a hashable key: (native_res, aspect, original_res, crop_extra, downscale_effect,
+            fit_aspect_to_bucket, strict_bucketing, extra_args, seed), with the strings already parsed.
+        '''
+        unknown = set(request) - set(REQUEST_FIELDS) - {"id"}
+        if unknown:
+            raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+        inputs = dict(self.defaults)
+        inputs.update(request)
+        native_res, aspect, original_res = self._node.parse_inputs(*(as_node_string(inputs[name]) for name in ("native_res", "aspect", "original_res")))
+        fit = "enabled" if inputs["fit_aspect_to_bucket"] in (True, "enabled") else "disabled"
+        return (native_res, aspect, original_res, float(inputs["crop_extra"]), float(inputs["downscale_effect"]), fit,
+                str(inputs["strict_bucketing"]), str(inputs["extra_args"]), int(inputs["seed"]))
+
+    async def size(self, request):
+        ''' The seven outputs for a request dict (see the module docstring). '''
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            key = self.normalize(request)
+            # the type of original_res matters ("2" vs "2.0") but 2 == 2.0, so it's part of the cache key
+            cache_key = (type(key[2]),) + key
+            result = self.cache.get(cache_key)
+            if result is None:
+                self._start()
+                future = asyncio.get_running_loop().create_future()
+                waiting = self._pending.get(key)
+                if waiting is None:
+                    self._pending[key] = [future]
+                else:
+                    waiting.append(future)
+                    self.coalesced += 1
+                self._pending_count += 1
+                self._wakeup.set()
+                if self._pending_count >= self.max_batch:
+                    self._full.set()
+                result = await future
+            return result
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            end = time.perf_counter()
+            self._latencies.append((end, end - start))
+
+    async def _batcher(self):
+        while True:
+            await self._wakeup.wait()
+            if self._pending_count < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            pending = self._pending
+            self._pending, self._pending_count = {}, 0
+            self._wakeup.clear()
+            self._full.clear()
+            self._run_batch(pending)
+
+    def _run_batch(self, pending):
+        self.batches += 1
+        self.batched += len(pending)
+
+        # group by everything get_sizes_batch needs to be shared, plus the kinds of array it's given
+        groups = {}
+        for key in pending:
+            native_res, aspect, original_res, _, _, fit, strict, extra_args, seed = key
+            vector = get_sizes_batch is not None and compile_extra_args(extra_args).randomaspect is None
+            group = (native_res, fit, strict, extra_args, input_kind(aspect), input_kind(original_res)) if vector else None
+            groups.setdefault(group, []).append(key)
+
+        for group, keys in groups.items():
+            if group is not None and len(keys) >= self.min_vector:
+                try:
+                    results = self._size_vector(group, keys)
+                    self.vectorized += len(keys)
+                except Exception:
+                    # something in the group is bad; the scalar code will say which
+                    results = None
+                if results is not None:
+                    for key, result in zip(keys, results):
+                        self._resolve(pending[key], key, result)
+                    continue
+            for key in keys:
+                try:
+                    result = self._size_scalar(key)
+                except Exception as e:
+                    for future in pending[key]:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self._resolve(pending[key], key, result)
+
+    def _resolve(self, futures, key, result):
+        self.cache.put((type(key[2]),) + key, result)
+        for future in futures:
+            if not future.done():
+                future.set_result(result)
+
+    def _size_scalar(self, key):
+        native_res, aspect, original_res, crop_extra, downscale_effect, fit, strict, extra_args, seed = key
+        return get_sizes_numeric(native_res, aspect, original_res, crop_extra, downscale_effect, "disabled", fit, strict, extra_args, seed)
+
+    def _size_vector(self, group, keys):
+        native_res, fit, strict, extra_args, aspect_kind, original_kind = group
+        aspect = np.array([key[1] for key in keys], dtype = KIND_DTYPES[aspect_kind])
+        original_res = np.array([key[2] for key in keys], dtype = KIND_DTYPES[original_kind])
+        crop_extra = np.array([key[3] for key in keys], dtype = np.float64)
+        downscale_effect = np.array([key[4] for key in keys], dtype = np.float64)
+        out = get_sizes_batch(aspect, original_res, crop_extra, downscale_effect, native_res, strict, fit, extra_args)
+        return out.tolist()
+
+    def stats(self):
+        now = time.perf_counter()
+        uptime = time.monotonic() - self.started
+        # throughput over the last 10 seconds (or however much of it the latency samples still cover)
+        recent = [finished for finished, _ in self._latencies if now - finished <= 10.0]
+        span = now - recent[0] if recent else 0.0
+        out = {
+            "uptime_seconds": uptime,
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_second": self.requests / uptime if uptime else 0.0,
+            "recent_requests_per_second": len(recent) / span if span else 0.0,
+            "batches": self.batches,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "vectorized": self.vectorized,
+            "coalesced": self.coalesced,
+            "cache": self.cache.stats(),
+            "vector_backend": get_sizes_batch is not None,
+        }
+        out.update(_percentiles([latency for _, latency in self._latencies]))
+        return out
+
+    async def _reply(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            request_id = request.get("id")
+            if request.get("op") == "stats":
+                return {"id": request_id, "stats": self.stats()}
+            result = await self.size(request)
+            reply = {"id": request_id}
+            reply.update(zip(SIZE_FIELDS, result))
+            return reply
+        except Exception as e:
+            return {"id": request_id, "error": f"{type(e).__name__}: {e}"}
+
+    async def handle_connection(self, reader, writer):
+        ''' Serves one client: a request per line in, a reply per line out, in order. '''
+        replies = asyncio.Queue(maxsize = 4096)
+
+        async def write_replies():
+            while True:
+                task = await replies.get()
+                if task is None:
+                    break
+                writer.write((json.dumps(await task) + "\n").encode("utf-8"))
+                if replies.empty():
+                    await writer.drain()
+
+        writing = asyncio.get_running_loop().create_task(write_replies())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    await replies.put(asyncio.ensure_future(self._reply(line)))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await replies.put(None)
+            try:
+                await writing
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        return await asyncio.start_unix_server(self.handle_connection, path = path)
+
+    async def serve_tcp(self, host = "127.0.0.1", port = 8765):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+class SizingClient:
+    ''' An asyncio client for SizingServer. Requests can be pipelined: call size() from as many tasks as you like
+        and the replies are matched up in order.
+    '''
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._waiting = deque()
+        self._reading = asyncio.get_running_loop().create_task(self._read_replies())
+
+    @classmethod
+    async def connect(cls, unix = None, host = "127.0.0.1", port = 8765):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _read_replies(self):
+        while True:
+            line = await self._reader.readline()
+            if not line:
+                break
+            self._waiting.popleft().set_result(json.loads(line))
+        for future in self._waiting:
+            future.set_exception(ConnectionError("sizing server closed the connection"))
+
+    async def request(self, request):
+        ''' Sends one request dict and returns the reply dict. '''
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append(future)
+        self._writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self._writer.drain()
+        return await future
+
+    async def size(self, **inputs):
+        ''' The seven outputs for the given node inputs. Raises ValueError if the server couldn't size them. '''
+        reply = await self.request(inputs)
+        if "error" in reply:
+            raise ValueError(reply["error"])
+        return tuple(reply[name] for name in SIZE_FIELDS)
+
+    async def stats(self):
+        return (await self.request({"op": "stats"}))["stats"]
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._reading.cancel()
+
+
+def _random_request(rng, unique):
+    aspect = rng.choice(["16:9", "9:16", "4:3", "3:4", "1:1", "2:3", "3:2", "21:9"]) if unique == 0 else f"{rng.randint(1, unique)}:{rng.randint(1, unique)}"
+    original_res = rng.choice(["1920x1080", "1080x1920", "1024", "2.0", "800x1200", [3000, 2000], 1500])
+    return {"aspect": aspect, "original_res": original_res, "crop_extra": rng.choice([0.0, 0.1])}
+
+
+async def run_load(unix = None, host = "127.0.0.1", port = 8765, clients = 16, requests = 20000, window = 32, unique = 0, seed = 0):
+    ''' Load generator: clients connections each send their share of requests, keeping up to window in flight.
+        unique = 0 draws from a few common aspects (lots of cache hits), a bigger number makes more distinct
+        requests. Returns client side throughput and latency, plus the server's own stats.
+    '''
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+
+    async def one_client(count):
+        nonlocal errors
+        client = await SizingClient.connect(unix, host, port)
+        semaphore = asyncio.Semaphore(window)
+
+        async def one_request(request):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                reply = await client.request(request)
+                latencies.append(time.perf_counter() - start)
+                errors += "error" in reply
+
+        await asyncio.gather(*(one_request(_random_request(rng, unique)) for _ in range(count)))
+        await client.close()
+
+    start = time.perf_counter()
+    shares = [requests // clients + (i < requests % clients) for i in range(clients)]
+    await asyncio.gather(*(one_client(count) for count in shares if count))
+    elapsed = time.perf_counter() - start
+
+    client = await SizingClient.connect(unix, host, port)
+    server_stats = await client.stats()
+    await client.close()
+
+    result = {"requests": requests, "errors": errors, "seconds": elapsed, "requests_per_second": requests / elapsed if elapsed else 0.0}
+    result.update(_percentiles(latencies))
+    result["server"] = server_stats
+    return result
+
+
+async def _serve(args):
+    server = SizingServer(max_batch = args.max_batch, max_delay = args.max_delay / 1000, cache_size = args.cache_size)
+    if args.unix:
+        listener = await server.serve_unix(args.unix)
+        where = args.unix
+    else:
+        listener = await server.serve_tcp(args.host, args.port)
+        where = f"{args.host}:{args.port}"
+    print(f"sizing server listening on {where}", file = sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = "python -m SDXL_sizing.sizing_server", description = "Serve the sizing node's math over a socket, or load test a server.")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    for name in ("serve", "loadgen"):
+        command = commands.add_parser(name)
+        command.add_argument("--unix", default = None, help = "Unix socket path (otherwise TCP)")
+        command.add_argument("--host", default = "127.0.0.1")
+        command.add_argument("--port", type = int, default = 8765)
+        if name == "serve":
+            command.add_argument("--max-batch", type = int, default = 512)
+            command.add_argument("--max-delay", type = float, default = 2.0, help = "milliseconds to wait for requests to coalesce (default 2)")
+            command.add_argument("--cache-size", type = int, default = 65536)
+        else:
+            command.add_argument("--clients", type = int, default = 16)
+            command.add_argument("--requests", type = int, default = 20000)
+            command.add_argument("--window", type = int, default = 32, help = "requests in flight per client")
+            command.add_argument("--unique", type = int, default = 0, help = "0 for a few common aspects, N for N*N distinct ones")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            asyncio.run(_serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    result = asyncio.run(run_load(args.unix, args.host, args.port, args.clients, args.requests, args.window, args.unique))
+    print(json.dumps(result, indent = 2))
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+''' Parameter sweeps: the sizing node's outputs for every combination of a set of aspects, original resolutions,
+    crop_extra values, extra_args variants and bucket modes, in one node run instead of one node per combination.
+
+    Combinations that share their extra_args and bucket mode (and the kind of aspect and original_res, e.g. "16:9"
+    vs "1.5") are sized together with batch_sizing.get_sizes_batch. Without numpy, or with --randomaspect, they go
+    through the scalar code instead, which gives the same numbers.
+'''
+import itertools
+from typing import NamedTuple
+
+from .conditioning_sizing_for_SDXL import bucketing_options, compile_extra_args, get_sizes_numeric, sizing_node
+
+try:
+    import numpy as np
+    from .batch_sizing import KIND_DTYPES, get_sizes_batch, input_kind
+except ImportError:
+    np = None
+    get_sizes_batch = None
+
+
+# the order the swept inputs vary in, slowest first, so the variants of one image sit next to each other
+SWEEP_FIELDS = ("aspect", "original_res", "crop_extra", "extra_args", "strict_bucketing")
+
+_node = sizing_node()
+
+
+class SweepResult(NamedTuple):
+    inputs: dict    # the swept inputs for this combination, as given
+    sizes: tuple    # the sizing node's seven outputs
+
+
+def _split(text):
+    # items are separated by newlines or commas
+    return [item.strip() for line in str(text).splitlines() for item in line.split(",") if item.strip()]
+
+
+def parse_values(text):
+    ''' A list of the node's string values, as written in a sweep input: "16:9, 4:3, 1.5". An item with two colons
+        is an inclusive range, start:stop:step, e.g. "0.0:0.3:0.1" or "768:1536:256".
+    '''
+    values = []
+    for item in _split(text):
+        parts = item.split(":")
+        if len(parts) != 3:
+            values.append(item)
+            continue
+        start, stop, step = (_node.parse_res(part) for part in parts)
+        if not all(isinstance(v, (int, float)) for v in (start, stop, step)) or step <= 0:
+            raise ValueError(f"sweep: bad range '{item}', expected start:stop:step with a positive step")
+        count = int((stop - start) / step + 1e-9) + 1
+        as_float = any(isinstance(v, float) for v in (start, stop, step))
+        # multiplying rather than adding up the steps keeps float ranges from drifting
+        values.extend(repr(round(start + i * step, 10)) if as_float else str(start + i * step) for i in range(count))
+    return values
+
+
+def parse_variants(text):
+    ''' extra_args variants, one per line. "none" (or "-") stands for no extra_args. '''
+    lines = [line.strip() for line in str(text).splitlines() if line.strip()]
+    return [("" if line.lower() in ("none", "-") else line) for line in lines] or [""]
+
+
+def sweep(native_res, aspects, original_res, crop_extras = (0.0,), extra_args = ("",), strict_bucketing = ("SDXL Report",), downscale_effect = 0.0, fit_aspect_to_bucket = "disabled", seed = 0, dedupe = False):
+    ''' SweepResults for the Cartesian product of the swept inputs, in SWEEP_FIELDS order (the last one varies
+        fastest). aspects and original_res are lists of the node's strings, crop_extras a list of floats and
+        extra_args and strict_bucketing lists of the node's values. native_res, downscale_effect,
+        fit_aspect_to_bucket and seed are shared by every combination.
+
+        With dedupe, combinations whose seven outputs match an earlier one are left out.
+    '''
+    if isinstance(native_res, str):
+        native_res, _, _ = _node.parse_inputs(native_res, "1", "1")
+    for mode in strict_bucketing:
+        if mode not in bucketing_options():
+            raise ValueError(f"sweep: unknown strict_bucketing '{mode}', expected one of {bucketing_options()}")
+    fit = "enabled" if fit_aspect_to_bucket in (True, "enabled") else "disabled"
+
+    combos = list(itertools.product(aspects, original_res, [float(c) for c in crop_extras], extra_args, strict_bucketing))
+    keys = []
+    for aspect, original, crop_extra, args, mode in combos:
+        _, parsed_aspect, parsed_original = _node.parse_inputs("1024", str(aspect), str(original))
+        keys.append((parsed_aspect, parsed_original, crop_extra, args, mode))
+
+    # group what get_sizes_batch can do in one call
+    groups = {}
+    for i, (aspect, original, _, args, mode) in enumerate(keys):
+        vector = get_sizes_batch is not None and compile_extra_args(args).randomaspect is None
+        group = (args, mode, input_kind(aspect), input_kind(original)) if vector else None
+        groups.setdefault(group, []).append(i)
+
+    sizes = [None] * len(keys)
+    for group, indices in groups.items():
+        out = None
+        if group is not None:
+            args, mode, aspect_kind, original_kind = group
+            try:
+                out = get_sizes_batch(
+                    np.array([keys[i][0] for i in indices], dtype = KIND_DTYPES[aspect_kind]),
+                    np.array([keys[i][1] for i in indices], dtype = KIND_DTYPES[original_kind]),
+                    np.array([keys[i][2] for i in indices], dtype = np.float64),
+                    downscale_effect, native_res, mode, fit, args,
+                )
+            except (ValueError, OverflowError):
+                # an input the batch sizer refuses (or one too big for its int64 arrays); the scalar code gives the node's answer or error for it
+                out = None
+        if out is not None:
+            for i, row in zip(indices, out.tolist()):
+                sizes[i] = row
+        else:
+            for i in indices:
+                aspect, original, crop_extra, args, mode = keys[i]
+                sizes[i] = get_sizes_numeric(native_res, aspect, original, crop_extra, downscale_effect, "disabled", fit, mode, args, seed)
+
+    results = []
+    seen = set()
+    for combo, result in zip(combos, sizes):
+        if dedupe:
+            if result in seen:
+                continue
+            seen.add(result)
+        results.append(SweepResult(dict(zip(SWEEP_FIELDS, combo)), result))
+    return results
+
+
+def _label(inputs, swept):
+    return ", ".join(f"{name}={inputs[name] if inputs[name] != '' else 'none'}" for name in SWEEP_FIELDS if name in swept)
+
+
+class sizing_sweep_node:
+    ''' The advanced sizing node over every combination of several aspects, original_res values, crop_extra values,
+        extra_args variants (one per line, "none" for no extra args) and bucket modes (one per line), in one run.
+        Lists are comma or newline separated, and "start:stop:step" gives a range. Every output is a list, with a
+        label per combination naming the inputs that vary. dedupe drops combinations that size the same as an
+        earlier one.
+    '''
+    @classmethod
+    def INPUT_TYPES(s):
+        return {
+            "required": {
+                "native_res": ("STRING", {
+                    "multiline": False,
+                    "default": "1024"
+                }),
+                "aspects": ("STRING", {
+                    "multiline": True,
+                    "default": "1:1, 4:3, 16:9"
+                }),
+                "original_res": ("STRING", {
+                    "multiline": True,
+                    "default": "1.0"
+                }),
+                "crop_extras": ("STRING", {
+                    "multiline": False,
+                    "default": "0.0"
+                }),
+                "extra_args": ("STRING", {
+                    "multiline": True,
+                    "default": "none\n--nocrop"
+                }),
+                "strict_bucketing": ("STRING", {
+                    "multiline": True,
+                    "default": "SDXL Report"
+                }),
+            },
+            "optional": {
+                "downscale_effect": ("FLOAT", {
+                    "default": 0.0,
+                    "max": 1.0,
+                    "min": 0.0,
+                    "step": 0.05
+                }),
+                "fit_aspect_to_bucket": (["disabled", "enabled"],),
+                "dedupe": (["disabled", "enabled"],),
+                "seed": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 0xffffffffffffffff
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("INT", "INT", "INT", "INT", "INT", "INT", "FLOAT", "STRING")
+    RETURN_NAMES = ("width", "height", "crop_w", "crop_h", "target_width", "target_height", "downscale", "label")
+    OUTPUT_IS_LIST = (True,) * 8
+
+    FUNCTION = "sweep"
+
+    CATEGORY = "sizing"
+
+    def sweep(self, native_res, aspects, original_res, crop_extras, extra_args, strict_bucketing, downscale_effect = 0.0, fit_aspect_to_bucket = "disabled", dedupe = "disabled", seed = 0):
+        values = {
+            "aspect": parse_values(aspects),
+            "original_res": parse_values(original_res),
+            "crop_extra": [float(c) for c in parse_values(crop_extras)],
+            "extra_args": parse_variants(extra_args),
+            "strict_bucketing": [line.strip() for line in strict_bucketing.splitlines() if line.strip()],
+        }
+        for name, listed in values.items():
+            if not listed:
+                raise ValueError(f"sizing_sweep_node: {name} needs at least one value")
+        results = sweep(native_res, values["aspect"], values["original_res"], values["crop_extra"], values["extra_args"],
+                        values["strict_bucketing"], downscale_effect, fit_aspect_to_bucket, seed, dedupe == "enabled")
+
+        swept = {name for name, listed in values.items() if len(listed) > 1}
+        columns = [list(column) for column in zip(*(result.sizes for result in results))]
+        return tuple(columns) + ([_label(result.inputs, swept) for result in results],)
@@ -0,0 +1,15 @@
+''' The repo is a ComfyUI custom node folder rather than an installed package, so the tests import it by folder
+    name, the same way ComfyUI does (and benchmarks/_common.py).
+'''
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if os.path.dirname(ROOT) not in sys.path:
+    sys.path.insert(0, os.path.dirname(ROOT))
+
+
+def import_module(name):
+    return importlib.import_module(f"{os.path.basename(ROOT)}.{name}")
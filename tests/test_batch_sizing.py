@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from conftest import import_module
+
+np = pytest.importorskip("numpy")
+
+sizing = import_module("conditioning_sizing_for_SDXL")
+batch_sizing = import_module("batch_sizing")
+
+MODES = ["SDXL Report", "Comfy", "Smallest Buckets", "disabled"]
+EXTRA_ARGS = ["", "--nocrop", "--sharp", "--shortside", "--equivalent", "--nudge w 0.8", "--nudge h 0.5 --supersharp"]
+
+
+def _inputs(rng, kind, n):
+    ''' n aspects or original_res values of one kind, as the values get_sizes_numeric takes. '''
+    if kind == "aspect float":
+        return [rng.uniform(0.1, 5.0) for _ in range(n)]
+    if kind == "aspect int":
+        return [rng.choice([-1, 1, 2, 3, 4, 5]) for _ in range(n)]
+    if kind == "aspect pair":
+        return [(rng.randint(1, 20), rng.randint(1, 20)) for _ in range(n)]
+    if kind == "original int":
+        return [rng.randint(300, 4000) for _ in range(n)]
+    if kind == "original float":
+        return [rng.uniform(0.3, 3.0) for _ in range(n)]
+    return [(rng.randint(300, 4000), rng.randint(300, 4000)) for _ in range(n)]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("extra_args", EXTRA_ARGS)
+@pytest.mark.parametrize("fit", ["disabled", "enabled"])
+def test_batch_matches_numeric(mode, extra_args, fit):
+    rng = random.Random(f"{mode}|{extra_args}|{fit}")
+    for aspect_kind in ("float", "int", "pair"):
+        for original_kind in ("int", "float", "pair"):
+            n = 12
+            aspects = _inputs(rng, "aspect " + aspect_kind, n)
+            originals = _inputs(rng, "original " + original_kind, n)
+            crop_extras = [rng.choice([0.0, 0.1, 0.25]) for _ in range(n)]
+            downscale_effects = [rng.choice([0.0, 0.5, 1.0]) for _ in range(n)]
+            native_res = rng.choice([768, 1024, 1536])
+
+            out = batch_sizing.get_sizes_batch(
+                np.array(aspects, dtype = batch_sizing.KIND_DTYPES[aspect_kind]),
+                np.array(originals, dtype = batch_sizing.KIND_DTYPES[original_kind]),
+                np.array(crop_extras), np.array(downscale_effects), native_res, mode, fit, extra_args,
+            )
+            for i, row in enumerate(out.tolist()):
+                expected = sizing.get_sizes_numeric(native_res, aspects[i], originals[i], crop_extras[i], downscale_effects[i], "disabled", fit, mode, extra_args)
+                assert row == expected, (aspect_kind, original_kind, aspects[i], originals[i])
@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from conftest import import_module
+
+sizing = import_module("conditioning_sizing_for_SDXL")
+
+
+def _bounds(decimal):
+    decimal = round(decimal, 5)
+    x = str(decimal)
+    tolerance = 10**(-(len(x) - (x.find(".") + 1))-1)*5
+    return (decimal - tolerance, decimal + tolerance)
+
+
+def _find_fraction(decimal):
+    ''' The search best_fraction replaced: the first numerator whose nearest fraction is in the bounds. '''
+    decimal = round(decimal, 5)
+    low, high = _bounds(decimal)
+    i = 0
+    while True:
+        i += 1
+        d = round(i/decimal)
+        if d and low <= i/d < high:
+            return (i, d)
+
+
+# what find_fraction gave for these, including ratios near the 0.00001 floor and ones far above 1
+@pytest.mark.parametrize("decimal, fraction", [
+    (16/9, (16, 9)),
+    (1.78, (16, 9)),
+    (3.14159, (355, 113)),
+    (0.123456789, (10, 81)),
+    (2.4444530140225362, (25745, 10532)),
+    (1e-05, (1, 100000)),
+    (1.5e-05, (1, 50000)),
+    (5e-06, (1, 100000)),
+    (0.00012, (1, 8333)),
+    (0.00999, (7, 701)),
+    (0.0999999, (1, 10)),
+    (7.0, (7, 1)),
+    (12.5, (25, 2)),
+    (333.33333, (1000, 3)),
+    (1234.56789, (945679, 766)),
+    (4096.0, (4096, 1)),
+    (65535.5, (131071, 2)),
+])
+def test_matches_find_fraction(decimal, fraction):
+    assert sizing.best_fraction(decimal) == fraction
+    n, d = fraction
+    assert sizing.best_fraction(-decimal) == (-n, d)
+
+
+def test_matches_find_fraction_on_aspects():
+    rng = random.Random(0)
+    decimals = [rng.uniform(0.25, 4.0) for _ in range(300)] + [round(rng.uniform(0.25, 4.0), k) for k in range(1, 5) for _ in range(50)]
+    for decimal in decimals:
+        fraction = sizing.best_fraction(decimal)
+        assert fraction == _find_fraction(decimal), decimal
+        low, high = _bounds(decimal)
+        assert low <= fraction[0] / fraction[1] < high, decimal
+
+
+def test_rounds_to_zero():
+    # find_fraction divided by zero here
+    assert sizing.best_fraction(4e-06) == (0, 1)
+    assert sizing.best_fraction(0.0) == (0, 1)
+
+
+@pytest.mark.parametrize("max_denominator", [1, 10, 100])
+def test_small_max_denominator(max_denominator):
+    n, d = sizing.best_fraction(2.4444530140225362, max_denominator)
+    assert 1 <= d <= max_denominator
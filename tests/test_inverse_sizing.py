@@ -0,0 +1,33 @@
+import pytest
+
+from conftest import import_module
+
+pytest.importorskip("numpy")
+inverse_sizing = import_module("inverse_sizing")
+
+
+def _base(plan):
+    return plan.stages[0].target_width, plan.stages[0].target_height
+
+
+@pytest.mark.parametrize("final, base", [
+    # 1280x768 generates fewer pixels but its shape crops 4x as much off the top and bottom
+    ((1920, 1080), (1344, 768)),
+    ((1080, 1920), (768, 1344)),
+    ((3840, 2160), (1344, 768)),
+    # a small square shouldn't come from a 704x1344 base that loses half the picture
+    ((64, 64), (1024, 1024)),
+    ((1024, 1024), (1024, 1024)),
+])
+def test_plan_keeps_the_composition(final, base):
+    plan = inverse_sizing.plan_hires_fix(*final)[0]
+    assert _base(plan) == base
+    assert plan.composition_crop < 0.02
+
+
+def test_plan_passes_cover_the_final_size():
+    for final in ((1920, 1080), (3840, 2160), (2048, 2048), (5000, 1200)):
+        plan = inverse_sizing.plan_hires_fix(*final, max_upscale = 2.0)[0]
+        last = plan.stages[-1]
+        assert last.target_width >= final[0] and last.target_height >= final[1]
+        assert all(stage.upscale <= 2.0 + 1e-9 for stage in plan.stages)
@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import import_module
+
+sizing_results = import_module("sizing_results")
+
+ROWS = [
+    (1024, 576, 10, 0, 1344, 768, 1.0),
+    (800, 800, 0, 0, 1024, 1024, 0.78125),
+    (1920, 1080, 0, 36, 1216, 832, 0.5),
+]
+
+
+def _lengths(results):
+    return [len(column) for column in results._columns]
+
+
+@pytest.mark.parametrize("row, error", [
+    ((1, 2, 3.5, 4, 5, 6, 1.0), TypeError),
+    ((1, 2, 3, 4, 5, 2**31, 1.0), OverflowError),
+    ((1, 2, 3, 4, 5, 6, "x"), ValueError),
+    ((1, 2, 3), ValueError),
+])
+def test_bad_append_leaves_columns_alone(row, error):
+    results = sizing_results.SizingColumns(ROWS[:2])
+    with pytest.raises(error):
+        results.append(row)
+    assert _lengths(results) == [2] * 7
+    assert list(results) == ROWS[:2]
+
+
+def test_rows_round_trip():
+    results = sizing_results.SizingColumns(ROWS)
+    assert len(results) == 3
+    assert results[1] == ROWS[1]
+    assert list(results[1:]) == ROWS[1:]
+    assert list(results["crop_h"]) == [0, 0, 36]
+
+
+def test_to_arrow():
+    pa = pytest.importorskip("pyarrow")
+    table = sizing_results.SizingColumns(ROWS).to_arrow()
+    assert table.column_names == list(sizing_results.FIELDS)
+    assert table.schema.field("width").type == pa.int32()
+    assert table.schema.field("downscale").type == pa.float64()
+    assert [tuple(row.values()) for row in table.to_pylist()] == ROWS